@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Backfill of readings missed while the node server or the network was down.
+
+When a snapshot arrives more than BACKFILL_GAP seconds (and BACKFILL_MISSED of the
+hub's expected poll intervals) after the previous one, the readings in between are
+requested from the hub with Meteobridge's historical time selectors: [th0temp-val15]
+is the value of th0temp 15 minutes ago.  Meteobridge keeps these for up to an hour back (val5, val10, val15, val30 and val60), so only
+the last hour of a longer gap can be recovered.  Only fields read with the -act
+selector have a historical counterpart, aggregates such as daily maxima or rain
+totals are left out of the backfilled samples.
+
+The requests run on their own thread, a few offsets per request, so the live poll
+path never waits on them.
+
+Copyright 2021 Robert Paauwe and Gordon Larsen, MIT License
+"""
+import queue
+import threading
+import time
+
+from udi_interface import LOGGER
+
+from constants import BACKFILL_BATCH
+from template import Observation, CONVERTERS
+
+# Meteobridge valN selectors, minutes before the time of the request
+OFFSETS = (60, 30, 15, 10, 5)
+
+
+def backfill_fields(fields):
+    # Fields read with a single -act selector, their history is read with -valN
+    return tuple(f for f in fields
+                 if f.type in ('float', 'int') and f.token.count('[') == 1 and f.token.endswith('-act]'))
+
+
+class Backfill:
+    def __init__(self, fields, merge, batch=BACKFILL_BATCH):
+        """
+            merge(station, samples) is called on the backfill thread with the recovered
+            (timestamp, Observation) samples, oldest first.
+        """
+        self.fields = backfill_fields(fields)
+        self.merge = merge
+        self.batch = batch
+        self.filled = 0
+
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='mbbackfill', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread = None
+
+    def request(self, station, since, until):
+        """ Queue a backfill of the gap between since and until, called from the poll path """
+        if station.number in self._pending:
+            return
+        self._pending.add(station.number)
+        self._queue.put((station, since, until))
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            station = job[0]
+            try:
+                self.fill(*job)
+            except Exception as error:
+                LOGGER.error(f'Backfill for {station.label} failed: {type(error)} - {error}')
+            finally:
+                self._pending.discard(station.number)
+
+    def template(self, minutes):
+        return '%20'.join(f.token.replace('-act]', f'-val{m}]') for m in minutes for f in self.fields)
+
+    def fill(self, station, since, until):
+        # Offsets that fall inside the gap, at least five minutes clear of the snapshots on either side
+        minutes = sorted((m for m in OFFSETS if since + 300 <= until - m * 60 <= until - 300), reverse=True)
+        if until - since > OFFSETS[0] * 60 + 300:
+            LOGGER.warning(f'{station.label} gap of {(until - since) / 60:.0f} minutes, '
+                           f'only the last {OFFSETS[0]} minutes can be backfilled')
+        if not minutes:
+            return
+
+        samples = []
+        for n in range(0, len(minutes), self.batch):
+            batch = minutes[n:n + self.batch]
+            url = 'http://' + station.ip + '/cgi-bin/template.cgi?template=' + self.template(batch)
+            response = station.session.get(url, timeout=station.timeout)
+            if response.status_code != 200:
+                LOGGER.warning(f'Backfill request to {station.label} failed: {response.status_code}')
+                return
+            values = response.content.decode('utf-8').rstrip('\r\n').split(' ')
+            if len(values) < len(batch) * len(self.fields):
+                LOGGER.warning(f'Backfill response from {station.label} incomplete: {len(values)} values')
+                return
+
+            for i, m in enumerate(batch):
+                record = {}
+                for f, raw in zip(self.fields, values[i * len(self.fields):]):
+                    try:
+                        record[f.name] = None if '[' in raw else CONVERTERS[f.type](raw)
+                    except ValueError:
+                        record[f.name] = None
+                samples.append((until - m * 60, Observation(**record)))
+
+        self.merge(station, samples)
+        self.filled += len(samples)
+        LOGGER.info(f'Backfilled {len(samples)} snapshots for {station.label} '
+                    f'from {time.strftime("%H:%M", time.localtime(samples[0][0]))}')
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Poll cycle benchmark.
+
+Drives the node server against the local Meteobridge stand-in with a stubbed
+udi_interface and reports end-to-end poll latency, throughput and allocations, so
+performance regressions in the poll path show up as numbers.
+
+Run from the repository root:  python -m bench.bench_poll --cycles 500 --hubs 2
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench import udi_stub  # noqa: E402
+
+udi = udi_stub.install()
+
+from bench.mbserver import MeteobridgeStandIn  # noqa: E402
+from nodes import Controller  # noqa: E402
+
+
+def build_controller(addresses, units='metric', params=None):
+    """ Create and configure a controller for the given hub addresses, with its nodes discovered. """
+    poly = udi.Interface()
+    controller = Controller(poly, 'controller', 'controller', 'Meteobridge')
+    config = {'Address': addresses[0], 'Password': 'bench', 'Units': units}
+    for number, address in enumerate(addresses[1:], 2):
+        config[f'Address{number}'] = address
+    config.update(params or {})
+    poly.emit(poly.CUSTOMPARAMS, config)
+    controller.probe_stations(controller.stations)
+    controller.discover()
+    return controller, poly
+
+
+def cycle(controller):
+    snapshots = controller.fetch(controller.stations)
+    if snapshots is not None:
+        controller.publish(snapshots)
+    return snapshots is not None
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run(controller, poly, cycles, warmup=5):
+    for _ in range(warmup):
+        cycle(controller)
+
+    messages = poly.messages
+    failures = 0
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(cycles):
+        t0 = time.perf_counter()
+        if not cycle(controller):
+            failures += 1
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'cycles': cycles,
+        'failures': failures,
+        'throughput': cycles / elapsed,
+        'p50': percentile(latencies, 50) * 1000,
+        'p95': percentile(latencies, 95) * 1000,
+        'max': max(latencies) * 1000,
+        'mean': statistics.fmean(latencies) * 1000,
+        'messages': (poly.messages - messages) / cycles,
+    }
+
+
+def allocations(controller, cycles, top=5):
+    """ Trace allocations over a separate pass, timing is measured without tracemalloc running. """
+    tracemalloc.start()
+    cycle(controller)
+    before = tracemalloc.take_snapshot()
+    base, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    for _ in range(cycles):
+        cycle(controller)
+    current, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    # allocation sites in the node server only, the stand-in runs in this process too
+    plugin = [tracemalloc.Filter(True, os.path.join(ROOT, '*')),
+              tracemalloc.Filter(False, os.path.join(ROOT, 'bench', '*'))]
+    stats = after.filter_traces(plugin).compare_to(before.filter_traces(plugin), 'lineno')
+    return {
+        'growth': (current - base) / 1024,
+        'peak': (peak - base) / 1024,
+        'top': [str(s) for s in stats[:top]],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Meteobridge poll cycle benchmark')
+    parser.add_argument('--cycles', type=int, default=200)
+    parser.add_argument('--hubs', type=int, default=1, help='number of stand-in hubs polled per cycle')
+    parser.add_argument('--latency', type=float, default=0.0, help='stand-in response latency in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--missing', nargs='*', default=(), help='tokens the stand-in leaves unfilled')
+    parser.add_argument('--recorded', help='recorded responses for the stand-in to serve')
+    parser.add_argument('--units', default='metric', choices=('metric', 'us'))
+    parser.add_argument('--output', help='also write the results to this file')
+    args = parser.parse_args()
+
+    logging.getLogger('udi_stub').setLevel(logging.WARNING)
+
+    servers = [MeteobridgeStandIn(latency=args.latency, error_rate=args.error_rate, missing=args.missing,
+                                  recorded=args.recorded, password='bench').start() for _ in range(args.hubs)]
+
+    # the controller writes its profile relative to the working directory
+    os.chdir(tempfile.mkdtemp(prefix='mbbench'))
+    controller, poly = build_controller([s.address for s in servers], args.units)
+    try:
+        timing = run(controller, poly, args.cycles)
+        memory = allocations(controller, min(args.cycles, 100))
+    finally:
+        controller.close_stations()
+        for server in servers:
+            server.stop()
+
+    lines = [
+        f'hubs {args.hubs}, cycles {timing["cycles"]}, failures {timing["failures"]}, '
+        f'stand-in latency {args.latency * 1000:.0f} ms',
+        f'poll latency ms: p50 {timing["p50"]:.2f}  p95 {timing["p95"]:.2f}  '
+        f'max {timing["max"]:.2f}  mean {timing["mean"]:.2f}',
+        f'throughput: {timing["throughput"]:.1f} cycles/s, {timing["messages"]:.1f} PG3 messages/cycle',
+        f'memory KiB (process): peak {memory["peak"]:.1f}, growth {memory["growth"]:.1f}',
+        'top node server allocation sites:',
+    ] + ['  ' + line for line in memory['top']]
+    report = '\n'.join(lines)
+    print(report)
+    if args.output:
+        with open(os.path.join(ROOT, args.output) if not os.path.isabs(args.output) else args.output, 'w') as f:
+            f.write(report + '\n')
+
+
+if __name__ == '__main__':
+    main()
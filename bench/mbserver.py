@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for a Meteobridge /cgi-bin/template.cgi.
+
+Fills in the template tokens the plugin sends with synthetic values (or values
+from a file of recorded responses) so stationdata and set_drivers can be exercised
+without hardware.  Latency, HTTP errors and unfilled [token] responses can be
+configured to reproduce a slow or incomplete hub.
+
+Run standalone with:  python -m bench.mbserver --port 8080 --latency 0.2
+"""
+import argparse
+import base64
+import random
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+from constants import TEMPLATE_FIELDS, EXTRA_FIELDS
+
+TOKEN_RE = re.compile(r'\[([^\]]+)\]')
+HISTORY_RE = re.compile(r'-val\d+$')
+
+# Synthetic base values by template field name, numeric values get a small random walk
+BASE_VALUES = {
+    'temp': 18.4, 'dewpoint': 9.1, 'windchill': 18.4, 'temp_max': 22.3, 'temp_min': 11.2,
+    'temp_in': 21.5, 'dew_in': 10.2, 'hum': 55.0, 'hum_max': 81.0, 'hum_min': 42.0, 'hum_in': 44.0,
+    'press': 1008.3, 'press_sea': 1015.1, 'press_trend': 0, 'solar': 412.0, 'uv': 3.2,
+    'et0_vantage': 2.1, 'wind': 3.4, 'gust': 6.1, 'wind_dir': 225.0, 'wind_card': 'SW',
+    'rain_rate': 0.0, 'rain_today': 1.2, 'rain_24h': 2.4, 'rain_yesterday': 4.8,
+    'rain_month': 32.6, 'rain_year': 412.8, 'station': 'Tempest', 'station_num': '1',
+    'console_battery': 0, 'iss_battery': 0, 'lastgooddata': 4,
+    'lgt_strikes': 0, 'lgt_distance': 0.0, 'lgt_energy': 0.0, 'temp_extra1': 16.2, 'soil_temp': 12.5,
+}
+
+# Tokens filled from the clock
+CLOCK_TOKENS = {
+    'hh': lambda: time.strftime('%H'),
+    'mm': lambda: time.strftime('%M'),
+    'ss': lambda: time.strftime('%S'),
+    'epoch': lambda: str(int(time.time())),
+}
+
+
+class StandInState:
+    def __init__(self, latency=0.0, error_rate=0.0, missing=(), recorded=None, jitter=0.1,
+                 password=None, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.missing = set(missing)
+        self.jitter = jitter
+        self.password = password
+        self.random = random.Random(seed)
+        self.values = {}
+        self.requests = 0
+        self.lock = threading.Lock()
+
+        for field in TEMPLATE_FIELDS + EXTRA_FIELDS:
+            inner = TOKEN_RE.findall(field.token)
+            if len(inner) == 1 and field.name in BASE_VALUES:
+                self.values[inner[0]] = BASE_VALUES[field.name]
+
+        self.recorded = []
+        if recorded:
+            self.recorded = self.load_recorded(recorded)
+
+    @staticmethod
+    def load_recorded(path):
+        """ One raw Meteobridge response per line, in the order of the full template schema. """
+        tokens = [TOKEN_RE.findall(field.token) for field in TEMPLATE_FIELDS]
+        rows = []
+        with open(path) as recorded:
+            for line in recorded:
+                values = line.rstrip('\r\n').split(' ')
+                if len(values) < len(tokens):
+                    continue
+                rows.append({t[0]: v for t, v in zip(tokens, values) if len(t) == 1})
+        return rows
+
+    def value(self, token, row):
+        if token in self.missing:
+            return '[' + token + ']'
+        if token in CLOCK_TOKENS:
+            return CLOCK_TOKENS[token]()
+        if row is not None and token in row:
+            return row[token]
+        if token not in self.values:
+            # historical selectors (th0temp-val15) answer with the current value
+            token = HISTORY_RE.sub('-act', token)
+            if token not in self.values:
+                return '[' + token + ']'
+
+        value = self.values[token]
+        if isinstance(value, float) and self.jitter:
+            value = round(value + self.random.uniform(-self.jitter, self.jitter), 1)
+            self.values[token] = value
+        return str(value)
+
+    def fill(self, template):
+        with self.lock:
+            row = self.recorded[self.requests % len(self.recorded)] if self.recorded else None
+            self.requests += 1
+            return TOKEN_RE.sub(lambda m: self.value(m.group(1), row), template)
+
+
+class TemplateHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    wbufsize = 65536  # send headers and body together, unbuffered writes stall on delayed ACKs
+    state = None
+
+    def do_GET(self):
+        state = self.state
+        if state.latency:
+            time.sleep(state.latency)
+
+        if state.password is not None:
+            expected = 'Basic ' + base64.b64encode(f'meteobridge:{state.password}'.encode()).decode()
+            if self.headers.get('Authorization') != expected:
+                return self.reply(401, b'Unauthorized')
+
+        parts = urlsplit(self.path)
+        if parts.path != '/cgi-bin/template.cgi':
+            return self.reply(404, b'Not found')
+        if state.error_rate and state.random.random() < state.error_rate:
+            return self.reply(500, b'Internal error')
+
+        template = parse_qs(parts.query, keep_blank_values=True).get('template', [''])[0]
+        self.reply(200, state.fill(template).encode('utf-8'))
+
+    def reply(self, code, body):
+        self.send_response(code)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MeteobridgeStandIn:
+    def __init__(self, host='127.0.0.1', port=0, **options):
+        self.state = StandInState(**options)
+        handler = type('Handler', (TemplateHandler,), {'state': self.state})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def address(self):
+        host, port = self.server.server_address[:2]
+        return f'{host}:{port}'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name='mbstandin', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Meteobridge template.cgi stand-in')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with 500')
+    parser.add_argument('--missing', nargs='*', default=(), help='tokens returned unfilled, e.g. uv0index-act')
+    parser.add_argument('--recorded', help='file of recorded responses to serve in turn')
+    parser.add_argument('--password', help='require basic auth with this password')
+    args = parser.parse_args()
+
+    server = MeteobridgeStandIn(args.host, args.port, latency=args.latency, error_rate=args.error_rate,
+                                missing=args.missing, recorded=args.recorded, password=args.password)
+    print(f'Meteobridge stand-in listening on {server.address}')
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Replay of recorded Meteobridge responses.
+
+Feeds a recording made with the RecordFile parameter back through the node
+server's parse, conversion and publish path with a stubbed udi_interface.  The
+hubs are not contacted.  --speed 1 replays in real time, --speed 60 a minute per
+second and --speed 0 (the default) as fast as possible, which makes a long
+recording a throughput benchmark over real station data.  Snapshots are stamped
+with the replay time, so windowed values such as hourly rain only match the
+original at --speed 1.
+
+Run from the repository root:  python -m bench.replay meteobridge.rec.gz --speed 0
+"""
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from bench.bench_poll import build_controller, percentile
+from recorder import read_records, schema_for
+
+# hubs are never polled during a replay, this address refuses connections straight away
+NO_HUB = '127.0.0.1:9'
+
+
+def replay(controller, poly, records, speed=0.0):
+    stations = {station.number: station for station in controller.stations}
+    messages = poly.messages
+    latencies = []
+    errors = skipped = 0
+    first = wall = None
+
+    start = time.perf_counter()
+    for timestamp, number, template, text in records:
+        station = stations.get(number)
+        if station is None:
+            skipped += 1
+            continue
+        if first is None:
+            first, wall = timestamp, time.monotonic()
+        elif speed:
+            delay = (timestamp - first) / speed - (time.monotonic() - wall)
+            if delay > 0:
+                time.sleep(delay)
+
+        t0 = time.perf_counter()
+        try:
+            schema = station.push_schema if template == station.push_schema.template else schema_for(template)
+            obs = schema.parse(text)
+        except (KeyError, ValueError) as error:
+            errors += 1
+            logging.getLogger('replay').warning(f'Record at {timestamp:.0f} for hub {number} rejected: {error}')
+            continue
+        controller.publish([(station, station.merge_tiers(schema, obs))], t0)
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+
+    replayed = len(latencies)
+    return {
+        'records': replayed,
+        'errors': errors,
+        'skipped': skipped,
+        'throughput': replayed / elapsed if elapsed else 0.0,
+        'p50': percentile(latencies, 50) * 1000 if latencies else 0.0,
+        'p95': percentile(latencies, 95) * 1000 if latencies else 0.0,
+        'mean': statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        'messages': (poly.messages - messages) / replayed if replayed else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay recorded Meteobridge responses')
+    parser.add_argument('recording', help='file written by the RecordFile parameter')
+    parser.add_argument('--speed', type=float, default=0.0, help='replay speed, 1 is real time, 0 as fast as possible')
+    parser.add_argument('--units', default='metric', choices=('metric', 'us'))
+    parser.add_argument('--output', help='also write the results to this file')
+    args = parser.parse_args()
+
+    logging.getLogger('udi_stub').setLevel(logging.WARNING)
+    recording = os.path.abspath(args.recording)
+    output = os.path.abspath(args.output) if args.output else None
+
+    # one configured hub per hub number in the recording
+    hubs = sorted({number for timestamp, number, template, text in read_records(recording)} | {1})
+    params = {f'Address{number}': NO_HUB for number in hubs if number > 1}
+
+    # the controller writes its profile and store relative to the working directory
+    os.chdir(tempfile.mkdtemp(prefix='mbreplay'))
+    controller, poly = build_controller([NO_HUB], args.units, params)
+    try:
+        result = replay(controller, poly, read_records(recording), args.speed)
+    finally:
+        controller.close_stations()
+        if controller.store is not None:
+            controller.store.stop()
+
+    lines = [
+        f'{args.recording}: {result["records"]} records replayed, {result["errors"]} rejected, '
+        f'{result["skipped"]} for unknown hubs',
+        f'publish latency ms: p50 {result["p50"]:.2f}  p95 {result["p95"]:.2f}  mean {result["mean"]:.2f}',
+        f'throughput: {result["throughput"]:.1f} records/s, {result["messages"]:.1f} PG3 messages/record',
+    ]
+    print('\n'.join(lines))
+    if output:
+        with open(output, 'w') as out:
+            out.write('\n'.join(lines) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Minimal stand-in for udi_interface used by the benchmarks.
+
+install() registers a fake udi_interface module so the node server can be driven
+without PG3.  Messages the plugin sends are counted rather than delivered.
+"""
+import logging
+import sys
+import types
+
+LOGGER = logging.getLogger('udi_stub')
+
+
+class Node:
+    drivers = []
+
+    def __init__(self, polyglot, primary, address, name):
+        self.poly = polyglot
+        self.primary = primary
+        self.address = address
+        self.name = name
+        self.drivers = [dict(d) for d in self.drivers]
+
+    def setDriver(self, driver, value, report=True, force=False, uom=None, text=None):
+        for d in self.drivers:
+            if d['driver'] == driver:
+                # like udi_interface, only a changed value is reported unless forced
+                changed = d['value'] != value or (uom is not None and d['uom'] != uom)
+                d['value'] = value
+                if uom is not None:
+                    d['uom'] = uom
+                if report and (changed or force):
+                    self.reportDriver(d, force)
+                break
+
+    def reportDriver(self, driver, forceReport):
+        self.poly.send({'set': [{'address': self.address, 'driver': driver['driver'],
+                                 'value': str(driver['value']), 'uom': driver['uom'], 'text': None}]}, 'status')
+
+    def reportDrivers(self):
+        for d in self.drivers:
+            self.reportDriver(d, True)
+
+
+class Custom(dict):
+    def __init__(self, polyglot, name):
+        super().__init__()
+        self.name = name
+
+    def load(self, data, save=False):
+        self.clear()
+        self.update(data)
+
+    def __getitem__(self, key):
+        return self.get(key)
+
+    def delete(self, key):
+        self.pop(key, None)
+
+
+class Interface:
+    CUSTOMPARAMS = 'customparams'
+    CUSTOMDATA = 'customdata'
+    START = 'start'
+    STOP = 'stop'
+    POLL = 'poll'
+    ADDNODEDONE = 'addnodedone'
+    CONFIGDONE = 'configdone'
+
+    def __init__(self, classes=None):
+        self.nodes = {}
+        self.handlers = {}
+        self.messages = 0
+        self.entries = 0
+        self.profile_updates = 0
+
+    def subscribe(self, event, handler, address=None):
+        self.handlers.setdefault(event, []).append(handler)
+
+    def emit(self, event, *args):
+        for handler in self.handlers.get(event, []):
+            handler(*args)
+
+    def ready(self):
+        pass
+
+    def start(self, version=None):
+        pass
+
+    def addNode(self, node, conn_status=None, rename=False):
+        self.nodes[node.address] = node
+        self.emit(self.ADDNODEDONE, {'address': node.address})
+        return node
+
+    def getNode(self, address):
+        return self.nodes.get(address)
+
+    def getNodes(self):
+        return self.nodes
+
+    def send(self, message, msgtype):
+        self.messages += 1
+        self.entries += len(message.get('set', ()))
+
+    def updateProfile(self):
+        self.profile_updates += 1
+
+    def setCustomParamsDoc(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+def install():
+    """ Register the stub as udi_interface, must be called before importing the node server. """
+    module = types.ModuleType('udi_interface')
+    module.LOGGER = LOGGER
+    module.Node = Node
+    module.Custom = Custom
+    module.Interface = Interface
+    sys.modules['udi_interface'] = module
+    return module
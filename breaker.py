@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Connection state of a Meteobridge hub.
+
+A hub is healthy while its requests succeed and degraded after a failed request.
+After BREAKER_THRESHOLD failures in a row the circuit opens: the hub is no longer
+polled and only a cheap probe request is sent after a backoff that doubles with
+every failed probe, up to BREAKER_MAX seconds, with random jitter so several hubs
+(or node servers) don't retry in step.  A successful probe or push closes the
+circuit again.
+
+The state values are published on the controller's ST driver.
+
+Copyright 2021 Robert Paauwe and Gordon Larsen, MIT License
+"""
+import random
+import time
+
+from udi_interface import LOGGER
+
+from constants import BREAKER_THRESHOLD, BREAKER_BASE, BREAKER_MAX
+
+# Controller ST values, 1 keeps its earlier meaning of online
+NOT_CONFIGURED = 0
+HEALTHY = 1
+DEGRADED = 2
+OPEN = 3
+
+# The probe asks for a single value
+PROBE_TEMPLATE = '[mbsystem-lastgooddata]'
+
+
+class CircuitBreaker:
+    def __init__(self, name, threshold=BREAKER_THRESHOLD, base=BREAKER_BASE, limit=BREAKER_MAX):
+        self.name = name
+        self.threshold = threshold
+        self.base = base
+        self.limit = limit
+        self.state = HEALTHY
+        self.failures = 0
+        self.probes = 0
+        self.delay = 0.0
+        self.next_probe = 0.0
+        self.reason = None
+
+    @property
+    def open(self):
+        return self.state == OPEN
+
+    def ready(self):
+        """ False while the circuit is open and the next probe isn't due yet """
+        return self.state != OPEN or time.monotonic() >= self.next_probe
+
+    def success(self):
+        if self.state != HEALTHY:
+            LOGGER.info(f'{self.name} is responding again')
+        self.state = HEALTHY
+        self.failures = 0
+        self.probes = 0
+        self.reason = None
+
+    def reset(self):
+        # the hub's address or password changed, earlier failures say nothing about the new settings
+        self.state = HEALTHY
+        self.failures = 0
+        self.probes = 0
+        self.delay = 0.0
+        self.next_probe = 0.0
+        self.reason = None
+
+    def failure(self, reason):
+        self.failures += 1
+        self.reason = reason
+        if self.state == OPEN:
+            self.probes += 1
+        elif self.failures >= self.threshold:
+            self.state = OPEN
+            self.probes = 0
+        else:
+            self.state = DEGRADED
+            return
+
+        # full backoff doubles with each failed probe, jitter takes off up to half of it
+        backoff = min(self.limit, self.base * 2 ** self.probes)
+        self.delay = backoff * random.uniform(0.5, 1.0)
+        self.next_probe = time.monotonic() + self.delay
+        LOGGER.warning(f'{self.name} not responding ({reason}), next attempt in {self.delay:.0f} seconds')
@@ -1,91 +1,130 @@
+from collections import namedtuple
+
 # version = "3.1.4"  # added error trapping to catch missing values from Meteobridge
 # version = "3.2.0"  # added indoor readings to various node displays
 version = "3.3.0"   # added et0 calculations for non-Vantage weather stations provide offer Solar Radiation values
                     # basic Penman-Monteith method.  Use with discretion
 
+# HTTP timeouts (seconds) for requests to the Meteobridge, overridden by the
+# ConnectTimeout and ReadTimeout custom parameters
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 10
+
+
+CARDINAL_WIND_DIR_MAP = {
+    'N': 0,
+    'NNE': 1,
+    'NE': 2,
+    'ENE': 3,
+    'E': 4,
+    'ESE': 5,
+    'SE': 6,
+    'SSE': 7,
+    'S': 8,
+    'SSW': 9,
+    'SW': 10,
+    'WSW': 11,
+    'W': 12,
+    'WNW': 13,
+    'NW': 14,
+    'NNW': 15
+}
+
+
 def cardinal_wind_dir_map(cardinal_dir):
-    CARDINAL_WIND_DIR_MAP = {
-        'N': 0,
-        'NNE': 1,
-        'NE': 2,
-        'ENE': 3,
-        'E': 4,
-        'ESE': 5,
-        'SE': 6,
-        'SSE': 7,
-        'S': 8,
-        'SSW': 9,
-        'SW': 10,
-        'WSW': 11,
-        'W': 12,
-        'WNW': 13,
-        'NW': 14,
-        'NNW': 15
-    }
     if cardinal_dir in CARDINAL_WIND_DIR_MAP:
         return CARDINAL_WIND_DIR_MAP[cardinal_dir]
 
     return 0
 
 
-def mbtemplate():
-    MBTEMPLATELIST = [
-        "[th0temp-act]",  # 0, current outdoor temperature
-        "[th0dew-act]",  # 1, current outdoor dewpoint
-        "[wind0chill-act]",  # 2 current windchill as calculated by MeteoBridge
-        "[th0temp-dmax]",  # 3, max outdoor temp today
-        "[th0temp-dmin]",  # 4, min outdoor temp today
-        "[thb0temp-act]",  # 5, indoor temperature
-        "[thb0dew-act]",  # 6, indoor dew point
-
-        "[th0hum-act]",  # 7 current outdoor relative humidity
-        "[th0hum-dmax]",  # 8 max outdoor relative humidity today
-        "[th0hum-dmin]",  # 9 min outdoor relative humidity today
-        "[thb0hum-act]",  # 10 indoor humidity
-
-        "[thb0press-act]",  # 11 current station pressure
-        "[thb0seapress-act]",  # 12 current sea level barometric pressure
-        "[thb0press-delta3h=barotrend]",  # 13 pressure trend
-
-        "[sol0rad-act]",  # 14 current solar radiation
-        "[uv0index-act]",  # 15 current UV index
-        "[sol0evo-daysum]",  # 16 today's cumulative evapotranspiration - Davis Vantage only
-
-        "[wind0avgwind-act]",  # 17 average wind (depends on particular station)
-        "[wind0wind-max10]",  # 18 10 minute wind gust
-        "[wind0dir-act]",  # 19 current wind direction
-        "[wind0dir-act=endir]",  # 20 current cardinal wind direction
-
-        "[rain0rate-act]",  # 21 current rate of rainfall
-        "[rain0total-daysum]",  # 22 rain accumulation for today
-        "[rain0total-sum24h]",  # 23 rain over the last 24 hours
-        "[rain0total-ydmax]",  # 24 total rainfall yesterday
-        "[rain0total-monthsum]",  # 25 rain accumulation for this month
-        "[rain0total-yearsum]",  # 26 rain accumulation year-to-date
-
-        "[mbsystem-station]",  # 27 station id
-        "[mbsystem-stationnum]",  # 28 meteobridge station number
-        "[thb0lowbat-act]",  # 29 Station battery status (0=Ok, 1=Replace)
-        "[th0lowbat-act]",  # 30 Station battery status (0=Ok, 1=Replace)
-
-        #  "[UYYYY][UMM][UDD][Uhh][Umm][Uss] ",  # 31 current observation time
-        "[hh][mm][ss]",
-        "[epoch]",  # 32 current unix time
-        "[mbsystem-lastgooddata]",  # 33 seconds since last good data received from console
-
-        # Lightning data added to accommodate Weatherflow Tempest and others
-        "[lgt0total-daysum]", # 34 number of lightning strikes
-        "[lgt0dist-davg]", # 35 distance to lightning strikes
-        "[lgt0energy-davg]", # 36 average lightning strike intensity
-    ]
-    mbtemplate_tmp = ""
-    # values = str(CreateTemplate())
-    for tempstr in MBTEMPLATELIST:
-        mbtemplate_tmp = mbtemplate_tmp + tempstr + "%20"
-
-    mbtemplate_tmp.strip("%20")
+# Template field schema
+#
+# One entry per value requested from the Meteobridge, in the order the values are
+# returned.  Each field has a name (used for the parsed Observation record), the
+# template token, the value type and the node address and *_DRVS keys the value is
+# published to.  Fields with no node are used internally only.  The tier sets how
+# often a value is requested (see TIER_INTERVALS): fast values on every poll, slow
+# values that change rarely on the long poll, their last values are reused in between.
+
+TemplateField = namedtuple('TemplateField', 'name token type node drivers tier')
+TemplateField.__new__.__defaults__ = ('fast',)
+
+TEMPLATE_FIELDS = (
+    TemplateField('temp', '[th0temp-act]', 'float', 'temps', ('main',)),  # current outdoor temperature
+    TemplateField('dewpoint', '[th0dew-act]', 'float', 'temps', ('dewpoint',)),  # current outdoor dewpoint
+    TemplateField('windchill', '[wind0chill-act]', 'float', 'temps', ('windchill',)),  # windchill by MeteoBridge
+    TemplateField('temp_max', '[th0temp-dmax]', 'float', 'temps', ('tempmax',), 'slow'),  # max outdoor temp today
+    TemplateField('temp_min', '[th0temp-dmin]', 'float', 'temps', ('tempmin',), 'slow'),  # min outdoor temp today
+    TemplateField('temp_in', '[thb0temp-act]', 'float', 'temps', ('inside',)),  # indoor temperature
+    TemplateField('dew_in', '[thb0dew-act]', 'float', 'temps', ('dewin',)),  # indoor dew point
+
+    TemplateField('hum', '[th0hum-act]', 'float', 'humid', ('main',)),  # current outdoor relative humidity
+    TemplateField('hum_max', '[th0hum-dmax]', 'float', 'humid', ('max',), 'slow'),  # max outdoor humidity today
+    TemplateField('hum_min', '[th0hum-dmin]', 'float', 'humid', ('min',), 'slow'),  # min outdoor humidity today
+    TemplateField('hum_in', '[thb0hum-act]', 'float', 'humid', ('inside',)),  # indoor humidity
+
+    TemplateField('press', '[thb0press-act]', 'float', 'press', ('station',)),  # current station pressure
+    TemplateField('press_sea', '[thb0seapress-act]', 'float', 'press', ('sealevel',)),  # sea level pressure
+    TemplateField('press_trend', '[thb0press-delta3h=barotrend]', 'float', 'press', ('trend',)),  # pressure trend
+
+    TemplateField('solar', '[sol0rad-act]', 'float', 'solar', ('solar_radiation',)),  # current solar radiation
+    TemplateField('uv', '[uv0index-act]', 'float', 'solar', ('uv',)),  # current UV index
+    TemplateField('et0_vantage', '[sol0evo-daysum]', 'float', None, ()),  # today's ET0 - Davis Vantage only
+
+    TemplateField('wind', '[wind0avgwind-act]', 'float', 'winds', ('windspeed', 'windspeed1')),  # average wind
+    TemplateField('gust', '[wind0wind-max10]', 'float', 'winds', ('gustspeed', 'gustspeed1')),  # 10 minute gust
+    TemplateField('wind_dir', '[wind0dir-act]', 'float', 'winds', ('winddir',)),  # current wind direction
+    TemplateField('wind_card', '[wind0dir-act=endir]', 'cardinal', 'winds', ('winddircard',)),  # cardinal direction
+
+    TemplateField('rain_rate', '[rain0rate-act]', 'float', 'precip', ('rate',)),  # current rate of rainfall
+    TemplateField('rain_today', '[rain0total-daysum]', 'float', 'precip', ('daily',)),  # rain today
+    TemplateField('rain_24h', '[rain0total-sum24h]', 'float', 'precip', ('24hour',)),  # rain over the last 24 hours
+    TemplateField('rain_yesterday', '[rain0total-ydmax]', 'float', 'precip', ('yesterday',), 'slow'),  # rain yesterday
+    TemplateField('rain_month', '[rain0total-monthsum]', 'float', 'precip', ('monthly',), 'slow'),  # rain this month
+    TemplateField('rain_year', '[rain0total-yearsum]', 'float', 'precip', ('yearly',), 'slow'),  # rain year-to-date
+
+    TemplateField('station', '[mbsystem-station]', 'str', None, (), 'slow'),  # station id
+    TemplateField('station_num', '[mbsystem-stationnum]', 'str', None, (), 'slow'),  # meteobridge station number
+    TemplateField('console_battery', '[thb0lowbat-act]', 'int', 'controller', ('console_battery',), 'slow'),  # 1=Replace
+    TemplateField('iss_battery', '[th0lowbat-act]', 'int', 'controller', ('iss_battery',), 'slow'),  # 0=Ok, 1=Replace
+
+    TemplateField('timestamp', '[hh][mm][ss]', 'int', 'controller', ('timestamp',)),  # current observation time
+    TemplateField('epoch', '[epoch]', 'int', None, ()),  # current unix time
+    TemplateField('lastgooddata', '[mbsystem-lastgooddata]', 'int', 'controller', ('lastgooddata',)),  # seconds
+
+    # Lightning data added to accommodate Weatherflow Tempest and others
+    TemplateField('lgt_strikes', '[lgt0total-daysum]', 'float', 'lightning', ('strikes',)),  # lightning strikes
+    TemplateField('lgt_distance', '[lgt0dist-davg]', 'float', 'lightning', ('distance',)),  # distance to strikes
+    TemplateField('lgt_energy', '[lgt0energy-davg]', 'float', 'lightning', ('energy',)),  # average intensity
+)
+
+
+# Extra sensors, requested only when the capability probe finds them on the hub
+EXTRA_FIELDS = tuple(
+    TemplateField(f'temp_extra{n}', f'[th{n}temp-act]', 'float', 'temps', (f'extra{n}',)) for n in range(1, 10)
+) + (
+    TemplateField('soil_temp', '[soil1temp-act]', 'float', 'temps', ('soil',)),  # soil temperature
+)
+
+# Values derived by the node server rather than requested from the Meteobridge
+DERIVED_FIELDS = (
+    TemplateField('et0', None, 'float', 'solar', ('evapotranspiration',)),  # evapotranspiration today
+    TemplateField('et0_hourly', None, 'float', 'solar', ('et0_rate',)),  # evapotranspiration rate
+    TemplateField('rain_hour', None, 'float', 'precip', ('hourly',)),  # rain over the last hour, from history
+)
+
+# Template fields each derived value is calculated from, it is published if any of them is present
+DERIVED_FROM = {
+    'et0': ('solar', 'et0_vantage'),
+    'et0_hourly': ('solar',),
+    'rain_hour': ('rain_today',),
+}
+
+
+def mbtemplate(fields=TEMPLATE_FIELDS):
     # Insert spaces between elements of the template to allow splitting the returned data, but no trailing space
-    return mbtemplate_tmp
+    return "%20".join(field.token for field in fields)
 
 
 # Unit of Measure map
@@ -104,6 +143,8 @@ UOM = {
     'I_DEGREE': 14,
     'I_MMHR': 46,
     'I_INHR': 24,
+    'I_ET0_MMHR': 46,
+    'I_ET0_INHR': 24,
     'I_MM': 82,
     'I_INCHES': 105,
     'I_UV': 71,
@@ -182,14 +223,16 @@ LITE_DRVS = {
     'uv': 'ST',
     'solar_radiation': 'GV0',
     'luminance': 'GV1',
-    'evapotranspiration': 'GV2'
+    'evapotranspiration': 'GV2',
+    'et0_rate': 'GV3'
 }
 
 LITE_EDIT = {
     'uv': 'I_UV',
     'solar_radiation': 'I_RADIATION',
     'luminance': 'I_LUX',
-    'evapotranspiration': 'I_MM'
+    'evapotranspiration': 'I_MM',
+    'et0_rate': 'I_ET0_MMHR'
 }
 
 LTNG_DRVS = {
@@ -197,3 +240,91 @@ LTNG_DRVS = {
     'distance': 'GV0',
     'energy': 'GV1'
 }
+
+CTRL_DRVS = {
+    'console_battery': 'GV0',
+    'iss_battery': 'GV1',
+    'timestamp': 'GV2',
+    'lastgooddata': 'GV3',
+}
+
+# Driver maps by node address, used to resolve the schema's driver keys
+
+NODE_DRVS = {
+    'controller': CTRL_DRVS,
+    'temps': TEMP_DRVS,
+    'humid': HUMD_DRVS,
+    'press': PRES_DRVS,
+    'winds': WIND_DRVS,
+    'precip': RAIN_DRVS,
+    'solar': LITE_DRVS,
+    'lightning': LTNG_DRVS,
+}
+
+# Change detection for published drivers
+#
+# Drivers are only sent to PG3 when their value changes by more than the deadband
+# (in the raw Meteobridge units) or when a full refresh is due.  Deadbands are keyed
+# by node definition id and driver, drivers not listed must change to be sent.
+
+REFRESH_INTERVAL = 3600  # seconds between full refreshes, overridden by RefreshInterval
+
+DEADBANDS = {
+    'temperature': {
+        'ST': 0.1,
+        'GV0': 0.1,
+        'GV1': 0.1,
+        'GV4': 0.1,
+        'GV14': 0.1,
+    },
+    'pressure': {
+        'ST': 0.1,
+        'GV0': 0.1,
+    },
+    'meteobridge': {
+        'GV4': 5,  # rolling p95 fetch latency, ms
+        'GV5': 5,  # rolling p95 cycle time, ms
+    },
+}
+
+MAX_WORKERS = 4  # upper bound on hubs fetched concurrently
+
+# Adaptive polling: gust speed (m/s) at or above which weather is considered active,
+# overridden by the GustThreshold custom parameter
+GUST_THRESHOLD = 10.0
+
+METRICS_WINDOW = 100  # poll samples kept for the rolling timing percentiles
+
+NODE_ADD_TIMEOUT = 30  # seconds to wait for PG3 to confirm nodes added during discovery
+
+HISTORY_SIZE = 2880  # snapshots kept per hub in the rolling history, a day at 30 second polls
+
+# On-disk snapshot store, in the plugin's working directory
+STORE_FILE = 'meteobridge.db'
+STORE_BATCH = 20  # snapshots per write
+STORE_FLUSH_INTERVAL = 300  # seconds before a partial batch is written
+STORE_RETENTION_DAYS = 7  # default for the HistoryDays custom parameter, 0 disables the store
+
+# Seconds without a push from a hub before polling it again
+PUSH_TIMEOUT = 120
+
+# Gap in seconds between snapshots after which the missing readings are requested from the hub,
+# at least BACKFILL_MISSED of the hub's expected poll intervals, and the number of time offsets
+# requested per backfill call
+BACKFILL_GAP = 1200
+BACKFILL_MISSED = 2
+BACKFILL_BATCH = 2
+
+# Consecutive failed requests before a hub's circuit opens, and the probe backoff range in seconds
+BREAKER_THRESHOLD = 3
+BREAKER_BASE = 30
+BREAKER_MAX = 900
+
+# Seconds after which a tier is requested even without a long poll, 0 requests it on every poll
+TIER_INTERVALS = {
+    'fast': 0,
+    'slow': 3600,
+}
+
+# Seconds between capability probes of a hub, besides the probe at startup and on configuration changes
+SENSOR_PROBE_INTERVAL = 86400
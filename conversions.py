@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Unit conversions for published drivers.
+
+The Meteobridge always reports metric values (C, mb, m/s, mm, km).  A conversion
+plan is compiled in setup_nodedefs: each (node, driver) gets a ready-made converter
+chosen from the driver's editor, so the poll loop only applies it.  Switching
+between metric and US units just recompiles the plan.
+
+Copyright 2021 Robert Paauwe and Gordon Larsen, MIT License
+"""
+
+
+def scaled(factor=1.0, offset=0.0, digits=1):
+    def convert(value):
+        return round(value * factor + offset, digits)
+    return convert
+
+
+def identity(value):
+    return value
+
+
+def count(value):
+    return int(value)
+
+
+# Converter by editor id, from the metric value reported by the Meteobridge
+CONVERTERS = {
+    'I_TEMP_C': scaled(),
+    'I_TEMP_F': scaled(1.8, 32),
+    'I_HUMIDITY': scaled(),
+    'I_MB': scaled(),
+    'I_INHG': scaled(0.02952998751, digits=2),
+    'I_TREND': scaled(offset=2, digits=0),  # Meteobridge reports -2 .. +2, the ISY index is 0 .. 4
+    'I_MPS': scaled(),
+    'I_KPH': scaled(3.6),
+    'I_MPH': scaled(2.23694),
+    'I_MMHR': scaled(),
+    'I_INHR': scaled(0.0393701, digits=3),
+    'I_ET0_MMHR': scaled(digits=3),  # hourly ET0 is typically below 1 mm/h
+    'I_ET0_INHR': scaled(0.0393701, digits=4),
+    'I_MM': scaled(),
+    'I_INCHES': scaled(0.0393701, digits=3),
+    'I_UV': scaled(),
+    'I_RADIATION': scaled(),
+    'I_STRIKES': count,
+    'I_KM': scaled(),
+    'I_MILE': scaled(1 / 1.609344),
+    'I_ENERGY': scaled(),
+}
+
+
+def compile_plan(targets, editors):
+    """
+        Build the conversion plan for a schema's publish targets.
+
+        targets: {address: ((field, driver), ...)} from the template schema
+        editors: {address: {driver: editor id}} from the configured driver lists
+        Returns {address: ((field, driver, converter), ...)}
+    """
+    plan = {}
+    for address, fields in targets.items():
+        node_editors = editors.get(address, {})
+        plan[address] = tuple((field, driver, CONVERTERS.get(node_editors.get(driver), identity))
+                              for field, driver in fields)
+    return plan
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Incremental reference evapotranspiration (ET0).
+
+Each snapshot gives an hourly ET0 rate from the FAO-56 Penman-Monteith equation for
+hourly time steps (FAO Irrigation and Drainage Paper 56, eq. 53) using the current
+temperature, humidity, wind, solar radiation and station pressure.  The rate is
+integrated over the time between snapshots into a running daily total that resets
+at local midnight.
+
+Saturation vapour pressure and the slope of its curve are cached per 0.1 degree
+temperature bucket.  Net longwave radiation needs the clear sky radiation, which
+needs the station's location, so a fixed cloudiness factor is used instead.
+
+Thanks to dwburger for the original daily ET0 script this replaces
+(https://github.com/dwburger/Tempest-ET0/blob/main/Tempest-ET0.py)
+
+Copyright 2021 Robert Paauwe and Gordon Larsen, MIT License
+"""
+import math
+import time
+from functools import lru_cache
+
+from udi_interface import LOGGER
+
+ALBEDO = 0.23
+STEFAN_BOLTZMANN = 2.043e-10  # MJ/m^2/hour/K^4
+CLOUD_FACTOR = 0.7  # 1.35 Rs/Rso - 0.35 for Rs/Rso of about 0.8
+SEA_LEVEL_KPA = 101.3
+MAX_STEP = 900  # seconds, longer gaps between snapshots only count this much
+
+
+@lru_cache(maxsize=2048)
+def _vapour(bucket):
+    temp = bucket / 10
+    es = 0.6108 * math.exp(17.27 * temp / (temp + 237.3))
+    return es, 4098 * es / (temp + 237.3) ** 2
+
+
+def saturation_vp(temp):
+    """ Saturation vapour pressure (kPa) and the slope of its curve (kPa/C) at temp (C) """
+    return _vapour(round(temp * 10))
+
+
+def hourly_rate(temp, humidity, wind, solar, pressure=None):
+    """
+        ET0 rate in mm/hour from temperature (C), relative humidity (%), wind speed (m/s, taken
+        as measured at 2 m), solar radiation (W/m^2) and station pressure (hPa).
+    """
+    es, delta = saturation_vp(temp)
+    ea = es * humidity / 100
+    gamma = 0.000665 * (pressure / 10 if pressure else SEA_LEVEL_KPA)
+
+    rs = solar * 0.0036  # MJ/m^2/hour
+    rnl = STEFAN_BOLTZMANN * (temp + 273.16) ** 4 * (0.34 - 0.14 * math.sqrt(max(ea, 0.0))) * CLOUD_FACTOR
+    rn = (1 - ALBEDO) * rs - rnl
+    g = 0.1 * rn if rs > 0 else 0.5 * rn
+
+    rate = (0.408 * delta * (rn - g) + gamma * 37 / (temp + 273) * wind * (es - ea)) / \
+        (delta + gamma * (1 + 0.34 * wind))
+    return max(rate, 0.0)
+
+
+class ET0Accumulator:
+    def __init__(self, name):
+        self.name = name
+        self.day = None
+        self.total = 0.0
+        self.rate = None
+        self.last_time = None
+        self.reported = None
+
+    def update(self, timestamp, obs, reported=None):
+        """
+            Add the snapshot's contribution and return (hourly rate, today's total), both in mm.
+            reported is the hub's own ET0 for today (Davis Vantage) and is compared with the
+            calculated total when the day ends.
+        """
+        day = time.localtime(timestamp)[:3]
+        if day != self.day:
+            self.reset(day)
+
+        if None in (obs.temp, obs.hum, obs.wind, obs.solar):
+            # without the sensors there is no ET0 at all, rather than a total of zero
+            return self.rate, self.total if self.rate is not None else None
+        rate = hourly_rate(obs.temp, obs.hum, obs.wind, obs.solar, obs.press)
+
+        if self.last_time is not None and self.rate is not None and timestamp > self.last_time:
+            step = min(timestamp - self.last_time, MAX_STEP)
+            self.total += (self.rate + rate) / 2 * step / 3600
+        self.rate = rate
+        self.last_time = timestamp
+        if reported is not None:
+            self.reported = reported
+        return rate, self.total
+
+    def reset(self, day):
+        if self.day is not None and self.reported is not None:
+            LOGGER.info(f'{self.name} ET0 for {self.day[0]}-{self.day[1]:02}-{self.day[2]:02}: '
+                        f'calculated {self.total:.2f} mm, reported by the hub {self.reported:.2f} mm')
+        self.day = day
+        self.total = 0.0
+        self.reported = None
+        # the day starts from the last rate so the first interval after midnight counts
+        if self.last_time is not None:
+            self.last_time = max(self.last_time, time.mktime(day + (0, 0, 0, 0, 0, -1)))
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Rolling history of recent poll snapshots.
+
+A fixed size ring buffer with one array('d') column per numeric template field, so
+memory is bounded and predictable no matter how long the node server runs.
+Appending is O(1); windowed queries find the start of the window with a binary
+search on the timestamps and scan only the samples inside it.  Derived values such
+as rain over the last hour come from here rather than extra template fields.
+
+Copyright 2021 Robert Paauwe and Gordon Larsen, MIT License
+"""
+import math
+from array import array
+
+from constants import HISTORY_SIZE
+
+NUMERIC_TYPES = ('float', 'int', 'cardinal')
+
+
+class History:
+    def __init__(self, fields, size=HISTORY_SIZE):
+        self.size = size
+        self.names = tuple(f.name for f in fields if f.type in NUMERIC_TYPES)
+        self.times = array('d', [math.nan]) * size
+        self.columns = {name: array('d', [math.nan]) * size for name in self.names}
+        self.head = 0  # next slot written
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, timestamp, obs):
+        head = self.head
+        self.times[head] = timestamp
+        for name, column in self.columns.items():
+            value = getattr(obs, name)
+            column[head] = math.nan if value is None else value
+        self.head = (head + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+
+    def merge(self, samples):
+        """
+            Insert (timestamp, obs) samples from an earlier time, e.g. backfilled data, keeping the
+            buffer in time order.  The oldest samples drop out when it is full.
+        """
+        rows = [(self.times[slot], [self.columns[name][slot] for name in self.names])
+                for slot in map(self._slot, range(self.count))]
+        for timestamp, obs in samples:
+            values = (getattr(obs, name) for name in self.names)
+            rows.append((timestamp, [math.nan if value is None else value for value in values]))
+        rows.sort(key=lambda row: row[0])
+        rows = rows[-self.size:]
+
+        for slot, (timestamp, values) in enumerate(rows):
+            self.times[slot] = timestamp
+            for name, value in zip(self.names, values):
+                self.columns[name][slot] = value
+        self.count = len(rows)
+        self.head = self.count % self.size
+
+    def _slot(self, n):
+        # ring position of the n-th oldest sample
+        return (self.head - self.count + n) % self.size
+
+    def _start(self, since):
+        # index (oldest = 0) of the first sample at or after since
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.times[self._slot(mid)] < since:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def window(self, name, seconds, now):
+        """ Values of a field over the last seconds, oldest first, missing values skipped """
+        column = self.columns[name]
+        values = []
+        for n in range(self._start(now - seconds), self.count):
+            value = column[self._slot(n)]
+            if value == value:  # not nan
+                values.append(value)
+        return values
+
+    def latest(self, name):
+        if self.count == 0:
+            return None
+        value = self.columns[name][self._slot(self.count - 1)]
+        return None if value != value else value
+
+    def last_time(self):
+        return self.times[self._slot(self.count - 1)] if self.count else None
+
+    def min(self, name, seconds, now):
+        values = self.window(name, seconds, now)
+        return min(values) if values else None
+
+    def max(self, name, seconds, now):
+        values = self.window(name, seconds, now)
+        return max(values) if values else None
+
+    def mean(self, name, seconds, now):
+        values = self.window(name, seconds, now)
+        return sum(values) / len(values) if values else None
+
+    def increase(self, name, seconds, now):
+        """
+            Total increase of an accumulating field over the window.  A drop is taken as the
+            counter resetting (e.g. daily rain at midnight), so only rises are summed.
+        """
+        values = self.window(name, seconds, now)
+        return sum(b - a for a, b in zip(values, values[1:]) if b > a)
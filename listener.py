@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Embedded HTTP listener for Meteobridge push requests.
+
+A Meteobridge can send a templated HTTP request to an external URL on its own
+schedule.  The hub is configured to request
+
+    http://<node server host>:<ListenPort>/push?<template>
+
+(/push/N for hub N) with the same template the plugin polls with.  The hub fills
+in the tokens, the listener decodes the query string (or a POST body) and hands
+the space separated values to the receive callback, which parses and publishes
+them immediately.  Pushes are only accepted from the hub's configured address.
+
+Other GET paths are looked up in the listener's routes, e.g. the snapshot API.
+
+Copyright 2021 Robert Paauwe and Gordon Larsen, MIT License
+"""
+import re
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, unquote
+
+from udi_interface import LOGGER
+
+PUSH_PATH = re.compile(r'/push(?:/(\d+))?/?')
+
+
+class PushHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    wbufsize = 65536  # send headers and body together, unbuffered writes stall on delayed ACKs
+    receive = None
+    routes = {}
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        route = self.routes.get(parts.path)
+        if route is not None:
+            content_type, body = route()
+            return self.reply(200, body, content_type)
+        self.push(parts.path, unquote(parts.query))
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode('utf-8', errors='replace')
+        self.push(urlsplit(self.path).path, unquote(body))
+
+    def push(self, path, text):
+        match = PUSH_PATH.fullmatch(path)
+        if match is None:
+            return self.reply(404, b'Not found')
+
+        number = int(match.group(1) or 1)
+        code = self.receive(number, text, self.client_address[0])
+        self.reply(code, b'OK' if code == 200 else b'Forbidden' if code == 403 else b'Rejected')
+
+    def reply(self, code, body, content_type='text/plain'):
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        LOGGER.debug(f'push listener {self.address_string()}: {format % args}')
+
+
+class PushListener:
+    def __init__(self, port, receive, routes=None, host=''):
+        """
+            receive(number, text, client) is called on the request thread with the hub number, the
+            decoded push and the client's address and returns the HTTP status to answer with.  routes maps other paths to
+            a callable returning (content type, body).
+        """
+        handler = type('Handler', (PushHandler,), {'receive': staticmethod(receive), 'routes': dict(routes or {})})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name='mblistener', daemon=True)
+        self.thread.start()
+        LOGGER.info(f'Listening for Meteobridge pushes on port {self.port}')
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        LOGGER.info(f'Push listener on port {self.port} stopped')
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Poll timing instrumentation.
+
+Each poll is timed by stage (HTTP fetch, parse, conversion/ET0, publish) and the
+whole cycle, along with the number of PG3 messages each cycle sends.  The last
+METRICS_WINDOW samples of each are kept for rolling percentiles, which are logged
+and published on the controller node.
+
+Copyright 2021 Robert Paauwe and Gordon Larsen, MIT License
+"""
+from collections import deque
+
+from udi_interface import LOGGER
+
+from constants import METRICS_WINDOW
+
+
+class RollingStats:
+    def __init__(self, size=METRICS_WINDOW):
+        self.values = deque(maxlen=size)
+
+    def __len__(self):
+        return len(self.values)
+
+    def add(self, value):
+        self.values.append(value)
+
+    def percentile(self, pct):
+        if not self.values:
+            return 0.0
+        ordered = sorted(self.values)
+        return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class PollMetrics:
+    STAGES = ('fetch', 'parse', 'convert', 'publish', 'cycle')
+
+    def __init__(self, size=METRICS_WINDOW):
+        self.stages = {stage: RollingStats(size) for stage in self.STAGES}
+        self.messages = RollingStats(size)
+        self.errors = 0
+
+    def add(self, stage, seconds):
+        self.stages[stage].add(seconds)
+
+    def add_messages(self, count):
+        self.messages.add(count)
+
+    def error(self):
+        self.errors += 1
+
+    def ms(self, stage, pct=95):
+        """ Rolling percentile of a stage in milliseconds """
+        return round(self.stages[stage].percentile(pct) * 1000, 1)
+
+    def log(self):
+        summary = ', '.join(f'{stage} p50 {self.ms(stage, 50)} p95 {self.ms(stage)} ms'
+                            for stage in self.STAGES if len(self.stages[stage]))
+        LOGGER.debug(f'Poll timing: {summary}, messages per cycle p50 {self.messages.percentile(50)} '
+                     f'p95 {self.messages.percentile(95)}, errors {self.errors}')
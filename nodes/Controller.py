@@ -8,12 +8,14 @@ Customized to use template queries from MeteoBridge by Gordon Larsen
 
 Copyright 2021 Robert Paauwe and Gordon Larsen, MIT License
 """
+import re
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 from udi_interface import Node, Custom, LOGGER
 
 from write_profile import write_profile
-import requests
 
 from nodes import TemperatureNode
 from nodes import HumidityNode
@@ -24,16 +26,44 @@ from nodes import LightNode
 from nodes import LightningNode
 
 from constants import *
+from template import TemplateSchema
+from publisher import Publisher
+from poller import Poller
+from station import Station
+from metrics import PollMetrics
+from conversions import compile_plan
+from tsstore import TimeSeriesStore
+from listener import PushListener
+from backfill import Backfill
+from snapshot import SnapshotCache
+from recorder import Recorder
+from profiler import CycleProfiler
+from breaker import PROBE_TEMPLATE, NOT_CONFIGURED, HEALTHY
+from template import Observation
+
+# Node class, name and controller attribute holding the driver list for each node address
+NODES = {
+    'temps': (TemperatureNode, 'Temperatures', 'temperature_list'),
+    'precip': (PrecipNode, 'Precipitation', 'rain_list'),
+    'humid': (HumidityNode, 'Humidity', 'humidity_list'),
+    'winds': (WindNode, 'Wind', 'wind_list'),
+    'solar': (LightNode, 'Illumination', 'light_list'),
+    'press': (PressureNode, 'Barometric Pressure', 'pressure_list'),
+    'lightning': (LightningNode, 'Lightning', 'lightning_list'),
+}
 
 
 class Controller(Node):
     id = 'meteobridge'
     drivers = [
-        {'driver': 'ST', 'value': 1, 'uom': 2},
+        {'driver': 'ST', 'value': 1, 'uom': 25},
         {'driver': 'GV0', 'value': 0, 'uom': 25},
         {'driver': 'GV1', 'value': 0, 'uom': 25},
         {'driver': 'GV2', 'value': 0, 'uom': 56},
         {'driver': 'GV3', 'value': 0, 'uom': 58},
+        {'driver': 'GV4', 'value': 0, 'uom': 42},
+        {'driver': 'GV5', 'value': 0, 'uom': 42},
+        {'driver': 'GV6', 'value': 0, 'uom': 56},
     ]
 
     def __init__(self, polyglot, parent, address, name):
@@ -47,8 +77,26 @@ class Controller(Node):
         self.primary = parent
         self.configured = False
 
-        self.password = ""
         self.username = "meteobridge"
+        self.stations = []
+        self.executor = None
+        self.publisher = Publisher()
+        self.metrics = PollMetrics()
+        self.store = None
+        self.listener = None
+        self.snapshots = SnapshotCache()
+        self.recorder = None
+        self.profile_cycles = None  # last Profile parameter, profiling is armed when it changes
+        self.backfill = Backfill(TEMPLATE_FIELDS, self.merge_backfill)
+        self.push_timeout = PUSH_TIMEOUT
+        self.publish_lock = threading.Lock()  # polls and pushes publish from different threads
+        self.cycle_start = None
+        self.poll_times = {}  # shortPoll/longPoll: monotonic time of the last one
+        self.poll_intervals = {}  # shortPoll/longPoll: measured seconds between them
+        self.poller = Poller(self.fetch, self.publish)
+        self.timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+        self.adaptive = True
+        self.gust_threshold = GUST_THRESHOLD
 
         self.Parameters = Custom(polyglot, 'customparams')
         self.Notices = Custom(polyglot, 'notices')
@@ -58,7 +106,7 @@ class Controller(Node):
         self.poly.subscribe(self.poly.START, self.start, address)
         self.poly.subscribe(self.poly.POLL, self.poll)
         # self.poly.subscribe(self.poly.CUSTOMDATA, address)
-        self.poly.subscribe(self.poly.ADDNODEDONE, self.node_queue)
+        self.poly.subscribe(self.poly.ADDNODEDONE, self.node_done)
         self.poly.subscribe(self.poly.STOP, self.stop)
 
         self.temperature_list = {}
@@ -70,323 +118,678 @@ class Controller(Node):
         self.lightning_list = {}
         self.myConfig = {}  # custom parameters
         self.units = 'metric'
-        self.ip = ""
-        self.n_queue = []
+        self.config_done = threading.Event()
+        self.nodedefs_lock = threading.RLock()  # driver lists, plans and profile are rebuilt from two threads
+        self.profile_ready = False  # node definitions are first written once start has probed the hubs
+        self.nodes_done = {}  # address: Event set when PG3 reports the node added
+        self.started = time.monotonic()
+        self.first_publish = None
         self.driver_list = []
 
-        self.last_wind_dir = ''
         self.lastgooddata = None
 
         self.poly.ready()
         self.poly.addNode(self)
 
-    def node_queue(self, data):
-        self.n_queue.append(data['address'])
+    def node_done(self, data):
+        self.nodes_done.setdefault(data['address'], threading.Event()).set()
 
-    def wait_for_node_done(self):
-        while len(self.n_queue) == 0:
-            time.sleep(0.1)
-        self.n_queue.pop()
+    def wait_for_nodes_done(self, addresses, timeout=NODE_ADD_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        for address in addresses:
+            if not self.nodes_done[address].wait(max(0.0, deadline - time.monotonic())):
+                LOGGER.warning(f'No confirmation from PG3 that node {address} was added')
 
     def start(self):
         LOGGER.info('Starting Meteobridge Node Server')
         self.poly.setCustomParamsDoc()
         LOGGER.debug(f'self.configured: {self.configured}, self.discovery.done {self.discovery_done}')
-        while not self.configured:
-            time.sleep(10)
+        # parameterHandler signals once the configuration is complete
+        self.config_done.wait()
 
+        self.probe_stations(self.stations)
         LOGGER.debug('Calling discovery from the start method')
         self.discover()
         LOGGER.debug(f'Discovery done: {self.discovery_done}')
 
-        LOGGER.debug(f'Connecting to Meteobridge at: {self.ip}')
-        data, result = self.stationdata(self.ip, self.username, self.password)
+        self.warm_start()
 
-        while result != 200:
-            LOGGER.info("Node server not configured yet")
+        LOGGER.debug(f'Connecting to Meteobridge hubs: {self.stations}')
+        self.backfill.start()
+        self.poller.start()
+        self.poller.trigger(self.stations)
+
+    def poll(self, polltype):
+        LOGGER.debug(f'Configured: {self.configured}')
+        kind = 'longPoll' if 'longPoll' in polltype else 'shortPoll'
+        now = time.monotonic()
+        if kind in self.poll_times:
+            self.poll_intervals[kind] = now - self.poll_times[kind]
+        self.poll_times[kind] = now
+
+        if not self.configured or not self.discovery_done:
+            LOGGER.info("Plugin not configured yet")
             return
 
-        self.set_drivers(data)
+        for station in self.stations:
+            if station.last_push is not None and not station.pushing(self.push_timeout):
+                LOGGER.warning(f'No push from {station.label} for {self.push_timeout:.0f} seconds, polling resumed')
+                station.last_push = None
+
+        # Hubs are polled on every short poll while the weather is active, otherwise on the long poll.
+        # Hubs that push their data are not polled while the pushes keep arriving, unreachable hubs
+        # are only probed once their backoff has passed.
+        stations = [station for station in self.stations
+                    if not station.pushing(self.push_timeout) and station.breaker.ready()
+                    and (station.breaker.open or station.scheduler.due(polltype))]
+        if not stations:
+            LOGGER.debug(f'Weather calm, skipping {polltype}')
+            return
 
-    def poll(self, polltype):
-        if 'longPoll' in polltype:
-            pass
-        else:
-            # read data
-            LOGGER.debug(f'Configured: {self.configured}')
-            while not self.configured:
-                LOGGER.info("Plugin not configured yet")
-                return
-            # Code for testing new polling structure
-            for node_address in self.poly.getNodes():
-                node = self.poly.getNode(node_address)
-                if node.address != 'controller':
-                    LOGGER.debug(f'Polling, node={node}, node.address={node.address} node.name={node.name}')
-            ###
-
-            data, result = self.stationdata(self.ip, self.username, self.password)
-            LOGGER.debug(f'return from getstationdata {data} result code {result}')
-            while result != 200:
-                # return if configuration is incomplete or incorrect
-                return
+        # fetch and publish happen on the poller's worker thread, slow template tiers on the long poll
+        self.poller.trigger(stations, 'longPoll' in polltype)
 
-            self.set_drivers(data)
-            LOGGER.info("Updated data from Meteobridge")
+    def fetch(self, stations, long=False):
+        """
+            Fetch a snapshot from every hub.  With more than one hub the requests run concurrently on
+            the worker pool, so the cycle takes about as long as the slowest hub.
+        """
+        self.cycle_start = time.perf_counter()
 
-    def set_drivers(self, data):
+        self.probe_stations(stations)
+        if len(stations) == 1 or self.executor is None:
+            results = [self.fetch_station(station, long) for station in stations]
+        else:
+            results = list(self.executor.map(self.fetch_station, stations, [long] * len(stations)))
+
+        snapshots = [r for r in results if r is not None]
+        if not snapshots:
+            with self.publish_lock:
+                self.end_cycle(self.cycle_start)
+                self.publisher.flush()
+            return None
+        return snapshots
+
+    def fetch_station(self, station, long=False):
+        if station.breaker.open and not self.probe(station):
+            return None
+
+        schema = station.poll_schema(long)
+        data, result = self.stationdata(station, schema)
+        LOGGER.debug(f'return from getstationdata {data} result code {result}')
+        if result != 200:
+            # configuration is incomplete or incorrect, or the Meteobridge didn't answer
+            station.breaker.failure(self.failure_reason(result))
+            return None
+
+        station.breaker.success()
+        return station, station.merge_tiers(schema, data)
+
+    def probe_stations(self, stations):
+        # Hubs are probed for their sensors at startup, after a configuration change and once a day.
+        # The node definitions are written here the first time, from the probed sensors.
+        changed = False
+        for station in stations:
+            if station.probe_due() and station.breaker.state == HEALTHY:
+                changed = self.probe_sensors(station) or changed
+        if changed or not self.profile_ready:
+            with self.nodedefs_lock:
+                self.setup_nodedefs(self.units)
+                self.profile_ready = True
+                if self.discovery_done:
+                    self.rebuild_drivers()
+                    # sensors the probe found for the first time get their nodes in the background
+                    missing = [station for station in self.stations if self.missing_nodes(station)]
+                    if missing:
+                        threading.Thread(target=self.discover, kwargs={'stations': missing, 'missing': True},
+                                         daemon=True).start()
+
+    def probe_sensors(self, station):
+        """
+            Ask the hub for every known field, the ones it leaves unfilled are sensors it doesn't
+            have.  Returns True if the hub's sensors changed.
+        """
+        fields = TEMPLATE_FIELDS + EXTRA_FIELDS
         try:
-
-            # Temperature values
-            node = TemperatureNode(self.poly, self.address, 'temps', 'Temperatures')
-            d = node.drivers
-            LOGGER.debug(f'Updating Temps Drivers {d}')
-
-            x = 0
-            for n in range(len(d)):
-                node.set_Driver(d[n]['driver'], float(data[x]), self.units)
-                x += 1
-
-            # Precipitation values
-            node = PrecipNode(self.poly, self.address, 'precip', 'Precipitation')
-            d = node.drivers
-            LOGGER.debug(f'Updating Precip Drivers{d}')
-
-            x = 0
-            for n in range(len(d)):
-                node.set_Driver(d[n]['driver'], float(data[21 + x]), self.units)
-                x += 1
-
-            # Humidity values
-            node = HumidityNode(self.poly, self.address, 'humid', 'Humidity')
-
-            d = node.drivers
-            LOGGER.debug(f'Updating Humidity Drivers {d}')
-            x = 0
-            for n in range(len(d)):
-                node.set_Driver(d[n]['driver'], float(data[7 + x]), )
-                x += 1
-
-            # Wind values
-            node = WindNode(self.poly, self.address, 'winds', 'Wind')
-            d = node.drivers
-            LOGGER.debug(f'Updating Wind Drivers {d}')
-
-            try:  # Meteobridge seems to sometimes return a nul string for wind0dir-act=endir
+            response = station.session.get(station.url(mbtemplate(fields)), timeout=station.timeout)
+            if response.status_code != 200:
+                station.breaker.failure(self.failure_reason(response.status_code))
+                return False
+            sensors = TemplateSchema.present(response.content.decode('utf-8'), fields)
+        except (OSError, ValueError) as err:
+            LOGGER.error(f'Sensor probe of {station.label} failed: {err}')
+            station.breaker.failure(self.failure_reason(None))
+            return False
+
+        absent = ', '.join(f.name for f in fields if f.name not in sensors)
+        LOGGER.info(f'{station.label} sensors probed, not present: {absent or "none"}')
+        return station.set_sensors(sensors)
+
+    def probe(self, station):
+        """ Cheap single value request to find out whether an unreachable hub is back """
+        try:
+            response = station.session.get(station.url(PROBE_TEMPLATE), timeout=station.timeout)
+            result = response.status_code
+        except OSError as err:
+            LOGGER.debug(f'Probe of {station.label} failed: {err}')
+            result = None
+        if result != 200:
+            station.breaker.failure(self.failure_reason(result))
+            return False
+        station.breaker.success()
+        return True
+
+    @staticmethod
+    def failure_reason(result):
+        if result == 401:
+            return 'authentication failed, check the password'
+        return f'HTTP status {result}' if result else 'no valid response'
+
+    def publish(self, snapshots, start=None):
+        with self.publish_lock:
+            self.publisher.begin()
+            for station, obs in snapshots:
+                self.set_drivers(station, obs)
+            self.end_cycle(self.cycle_start if start is None else start)
+            self.publisher.end()
+            self.metrics.add('publish', self.publisher.cycle_time)
+            self.metrics.add_messages(self.publisher.cycle_messages)
+            if self.first_publish is None:
+                self.first_publish = time.monotonic() - self.started
+                LOGGER.info(f'First weather data published {self.first_publish:.1f} seconds after startup')
+
+    def push_receive(self, number, text, client):
+        """
+            Called by the push listener for each request from a hub.  The push carries the same
+            values as a poll response and is published straight away.  Pushes that don't come
+            from the hub's address are refused.  Returns the HTTP status.
+        """
+        station = next((s for s in self.stations if s.number == number), None)
+        if station is None:
+            LOGGER.warning(f'Push received for unconfigured Meteobridge hub {number}')
+            return 404
+        if not station.accepts(client):
+            LOGGER.warning(f'Push for {station.label} from {client} refused, it is not the hub at {station.ip}')
+            return 403
+        if not self.discovery_done:
+            return 503
+
+        start = time.perf_counter()
+        if self.recorder is not None:
+            self.recorder.record(time.time(), number, station.push_schema.template, text)
+        try:
+            obs = station.merge_tiers(station.push_schema, station.push_schema.parse(text))
+        except ValueError as e:
+            self.metrics.error()
+            LOGGER.error(f'Invalid push from {station.label}: {e}')
+            return 400
+        self.metrics.add('parse', time.perf_counter() - start)
+
+        if not station.pushing(self.push_timeout):
+            LOGGER.info(f'Receiving pushes from {station.label}, polling paused while they keep arriving')
+        station.last_push = time.monotonic()
+        station.breaker.success()
+        self.publish([(station, obs)], start)
+        return 200
+
+    def end_cycle(self, start):
+        # Publish the rolling fetch latency, cycle time and error count on the controller
+        self.metrics.add('cycle', time.perf_counter() - start)
+        self.metrics.log()
+        self.publisher.publish(self, 'GV4', self.metrics.ms('fetch'))
+        self.publisher.publish(self, 'GV5', self.metrics.ms('cycle'))
+        self.publisher.publish(self, 'GV6', self.metrics.errors)
+        self.update_status()
+
+    def update_status(self):
+        # The controller ST shows the worst hub state, unreachable hubs also get a notice
+        self.publisher.publish(self, 'ST', max(station.breaker.state for station in self.stations))
+        for station in self.stations:
+            key = f'hub{station.number}'
+            if station.breaker.open:
+                notice = f'{station.label} at {station.ip} is not responding ({station.breaker.reason}), ' \
+                         f'retrying with backoff'
+                if self.Notices[key] != notice:
+                    self.Notices[key] = notice
+            elif key in self.Notices:
+                self.Notices.delete(key)
+
+    def set_drivers(self, station, obs):
+        try:
+            t0 = time.perf_counter()
+            if obs.wind_card is None and obs.wind_dir is not None:
+                # Meteobridge seems to sometimes return a nul string for wind0dir-act=endir
                 # so we substitute the last good reading
-                # self.wind_dir_cardinal = self.wind_card_dict[data[20]]
-                wind_dir_cardinal = cardinal_wind_dir_map(data[20])
-                self.last_wind_dir = wind_dir_cardinal
-
-            except:
-                wind_dir_cardinal = self.last_wind_dir
-                LOGGER.info(
-                    f"Cardinal wind direction substituted for last good reading: {self.last_wind_dir} ({data[20]})")
-
-            LOGGER.debug(
-                f"mbr wind: {float(data[17])}, gust: {float(data[18])}, dir: {data[19]}, wdc: {data[20]}, "
-                f"wind_dir_cardinal: {wind_dir_cardinal}, last_wind_dir: {self.last_wind_dir}")
-
-            node.set_Driver(d[0]['driver'], float(data[17]), self.units)
-            node.set_Driver(d[1]['driver'], data[18], self.units)
-            node.set_Driver(d[2]['driver'], float(data[19]), self.units)
-            node.set_Driver(d[3]['driver'], wind_dir_cardinal, )
-            node.set_Driver(d[4]['driver'], float(data[17]), self.units)
-            node.set_Driver(d[5]['driver'], float(data[18]), self.units)
-
-            # Light values
-            node = LightNode(self.poly, self.address, 'solar', 'Illumination')
-            d = node.drivers
-            LOGGER.debug(f'Updating Humidity Drivers {d}')
-            try:
-                uv = float(data[15])
-                node.set_Driver(d[0]['driver'], uv, )
-            except:  # no uv sensor
-                node.set_Driver(d[0]['driver'], 0)
-
-            try:
-                solarradiation = float(data[14])
-                solrad = True
-            except:
-            # catch case where solar data is not available
-                solrad = False
-                solarradiation = 0
-
-            node.set_Driver(d[1]['driver'], solarradiation, )
-
-            et0 = 0
-            if solrad:
-                if data[27] != "Vantage":
-                    et0 = calculate_et0(obs_data=data)
-                else:
-                    et0 = float(data[16])
+                LOGGER.info(f"Cardinal wind direction substituted for last good reading: {station.last_wind_dir}")
+                obs = obs._replace(wind_card=station.last_wind_dir)
             else:
-                LOGGER.info("Evapotranspiration not available ")
-
-            node.set_Driver(d[2]['driver'], et0, units=self.units)
-
-
-            # Barometric pressure values
-            node = PressureNode(self.poly, self.address, 'press', 'Barometric Pressure')
-            d = node.drivers
-            LOGGER.debug(f'Updating Pressure Drivers {d}')
-
-            node.set_Driver(d[0]['driver'], float(data[11]), self.units)
-            node.set_Driver(d[1]['driver'], float(data[12]), self.units)
-            node.set_Driver(d[2]['driver'], float(data[13]), self.units)
+                station.last_wind_dir = obs.wind_card
 
-            # Lightning values
-            node = LightningNode(self.poly, self.address, 'lightning', 'Lightning')
-            d = node.drivers
-            LOGGER.debug(f'Updating Lightning Drivers {d}')
-
-            node.set_Driver(d[0]['driver'], float(data[34]), self.units)
-            node.set_Driver(d[1]['driver'], float(data[35]), self.units)
-            node.set_Driver(d[2]['driver'], float(data[36]), self.units)
-
-            # Update controller drivers now
-
-            self.setDriver('GV3', data[33])  # Last good data
-            self.setDriver('GV0', int(float(data[29])))  # Console battery
-            self.setDriver('GV1', int(float(data[30])))  # ISS battery
-            # value 0 = Ok, 1 = Replace
-            self.setDriver('GV2', data[31])
-
-            LOGGER.debug(f"Timestamp: {int(float(data[31]))}, Last good data: {data[33]} second(s) ago")
+            LOGGER.debug(
+                f"mbr wind: {obs.wind}, gust: {obs.gust}, dir: {obs.wind_dir}, "
+                f"wind_dir_cardinal: {obs.wind_card}, last_wind_dir: {station.last_wind_dir}")
+
+            now = time.time()
+            last = station.history.last_time()
+            gap = self.backfill_gap(station)
+            if last is not None and gap is not None and now - last > gap:
+                # readings were missed, ask the hub for them without holding up this update
+                self.backfill.request(station, last, now)
+            station.history.append(now, obs)
+            if self.store is not None:
+                self.store.add(station.number, now, obs)
+
+            # Evapotranspiration is provided by Vantage stations, otherwise today's calculated total is used
+            vantage = obs.station == "Vantage"
+            et0_rate, et0_total = station.et0.update(now, obs, obs.et0_vantage if vantage else None)
+            rain_hour = station.history.increase('rain_today', 3600, now) if obs.rain_today is not None else None
+            obs = obs._replace(et0=obs.et0_vantage if vantage else et0_total, et0_hourly=et0_rate,
+                               rain_hour=rain_hour)
+            self.metrics.add('convert', time.perf_counter() - t0)
+            if self.listener is not None:
+                self.snapshots.update(station.number, now, obs)
+
+            # Apply the conversion plan compiled for the configured units
+            for address, entries in station.plan.items():
+                node = self.get_node(station, address)
+                if node is None:
+                    continue
+                LOGGER.debug(f'Updating {node.name} Drivers {node.drivers}')
+
+                for field, driver, convert in entries:
+                    self.publisher.publish(node, driver, getattr(obs, field), convert)
+
+            station.scheduler.update(obs)
+            LOGGER.info(f"Updated data from {station.label}")
+
+            LOGGER.debug(f"Timestamp: {obs.timestamp}, Last good data: {obs.lastgooddata} second(s) ago")
 
         except Exception as error:
-            LOGGER.error("Uncaught error:", type(error), __name__, "-", error) # Some error occurred
+            self.metrics.error()
+            LOGGER.error(f"Uncaught error: {type(error)} {__name__} - {error}")  # Some error occurred
+
+    def backfill_gap(self, station):
+        """
+            Seconds without a snapshot that count as missed readings.  A calm hub is only polled on the
+            long poll, so its gap is measured in long poll intervals and is unknown (None) until the
+            interval has been seen.
+        """
+        calm = station.scheduler.enabled and not station.scheduler.active
+        interval = self.poll_intervals.get('longPoll' if calm else 'shortPoll')
+        if interval is None:
+            return None if calm else BACKFILL_GAP
+        return max(BACKFILL_GAP, BACKFILL_MISSED * interval)
+
+    def merge_backfill(self, station, samples):
+        # Called on the backfill thread with the readings recovered from the hub
+        with self.publish_lock:
+            station.history.merge(samples)
+        if self.store is not None:
+            self.store.write([(station.number, ts) + tuple(getattr(obs, name) for name in self.store.names)
+                              for ts, obs in samples])
+
+    def get_node(self, station, address):
+        """
+            Return the node instance PG3 is tracking for the station's node address.  The registry is
+            filled by discover, nodes not created in this run are picked up once from the interface.
+            The controller drivers report on the first hub only.
+        """
+        if address == self.address:
+            return self if station.primary else None
+
+        node = station.nodes.get(address)
+        if node is None:
+            node = self.poly.getNode(station.address(address))
+            if node is None:
+                LOGGER.debug(f'Node {station.address(address)} not created yet')
+                return None
+            station.nodes[address] = node
+        return node
+
+    def missing_nodes(self, station):
+        # node addresses the driver lists call for that the station has no node for yet
+        return [address for address, (node_class, name, driver_list) in NODES.items()
+                if getattr(self, driver_list) and address not in station.nodes]
+
+    def node_exists(self, address):
+        return any(station.nodes.get(address) is not None for station in self.stations)
 
     def discover(self, *args, **kwargs):
+        """ With missing=True only the nodes the stations don't have yet are created """
+        stations = kwargs.get('stations', self.stations)
+        missing = kwargs.get('missing', False)
         LOGGER.info("Creating nodes.")
-        # Temperatures Node
-        node = TemperatureNode(self.poly, self.address, 'temps', 'Temperatures')
-        node.drivers = node.define_drivers(self.temperature_list)
-        self.poly.addNode(node)
-        self.wait_for_node_done()
-
-        # Precipitation node
-        node = PrecipNode(self.poly, self.address, 'precip', 'Precipitation')
-        node.drivers = node.define_drivers(self.rain_list)
-        self.poly.addNode(node)
-        self.wait_for_node_done()
-
-        # Humiditys Node
-        node = HumidityNode(self.poly, self.address, 'humid', 'Humidity')
-        node.drivers = node.define_drivers(self.humidity_list)
-        self.poly.addNode(node)
-        self.wait_for_node_done()
-
-        # Winds Node
-        node = WindNode(self.poly, self.address, 'winds', 'Wind')
-        node.drivers = node.define_drivers(self.wind_list)
-        self.poly.addNode(node)
-        self.wait_for_node_done()
-
-        # Illumination node
-        node = LightNode(self.poly, self.address, 'solar', 'Illumination')
-        node.drivers = node.define_drivers(self.light_list)
-        self.poly.addNode(node)
-        self.wait_for_node_done()
-
-        # Barometric Pressures Node
-        node = PressureNode(self.poly, self.address, 'press', 'Barometric Pressure')
-        node.drivers = node.define_drivers(self.pressure_list)
-        self.poly.addNode(node)
-        self.wait_for_node_done()
-
-        # Lightning Node
-        node = LightningNode(self.poly, self.address, 'lightning', 'Lightning')
-        node.drivers = node.define_drivers(self.lightning_list)
-        self.poly.addNode(node)
-        self.wait_for_node_done()
+        # Submit every node, then wait for PG3 to confirm them all rather than one round-trip each
+        added = []
+        for station in stations:
+            for address, (node_class, name, driver_list) in NODES.items():
+                if not getattr(self, driver_list):
+                    LOGGER.info(f'No {name} sensors, {station.node_name(name)} node not created')
+                    continue
+                node = station.nodes.get(address)
+                if node is not None and missing:
+                    continue
+                if node is None:
+                    node = node_class(self.poly, self.address, station.address(address), station.node_name(name))
+                node.drivers = node.define_drivers(getattr(self, driver_list))
+                self.nodes_done[node.address] = threading.Event()
+                self.poly.addNode(node)
+                station.nodes[address] = node
+                added.append(node.address)
+        self.wait_for_nodes_done(added)
 
         self.discovery_done = True
         LOGGER.debug("Finished discovery, node setup complete")
 
+    def rebuild_drivers(self):
+        # Configuration changed after discovery, replace each node's driver table with the new units
+        for station in self.stations:
+            for address, (node_class, name, driver_list) in NODES.items():
+                node = self.get_node(station, address)
+                if node is not None:
+                    node.define_drivers(getattr(self, driver_list))
+
     def delete(self):
         self.stopping = True
         LOGGER.warning('Removing Meteobridge nodeserver.')
 
     def stop(self):
         LOGGER.warning('Meteobridge NodeServer stopped.')
+        self.poller.stop()
+        self.backfill.stop()
+        if self.listener is not None:
+            self.listener.stop()
+        self.close_stations()
+        if self.store is not None:
+            self.store.stop()
+        if self.recorder is not None:
+            self.recorder.close()
         self.poly.stop()
 
     def parameterHandler(self, config):
         self.Parameters.load(config)
         LOGGER.debug(f'Parameters: {self.Parameters}')
         self.Notices.clear()
-        ip_exists = False
-        password_exists = False
 
-        self.ip = self.Parameters['Address']
         if self.units is not None:
             self.units = self.Parameters['Units'].lower()
-        self.password = self.Parameters['Password']
+        self.timeout = (self.param_float('ConnectTimeout', CONNECT_TIMEOUT),
+                        self.param_float('ReadTimeout', READ_TIMEOUT))
+        self.publisher.reset(self.param_float('RefreshInterval', REFRESH_INTERVAL))
+        self.publisher.batch = (self.Parameters['BatchReports'] or 'true').lower() != 'false'
+
+        self.gust_threshold = self.param_float('GustThreshold', GUST_THRESHOLD)
+        self.adaptive = (self.Parameters['AdaptivePoll'] or 'true').lower() != 'false'
+        self.configure_store(self.param_float('HistoryDays', STORE_RETENTION_DAYS))
+        self.push_timeout = self.param_float('PushTimeout', PUSH_TIMEOUT)
+        self.configure_recorder(self.Parameters['RecordFile'] or '')
+        self.configure_profiler(int(self.param_float('Profile', 0)))
+        stations = self.configure_stations()
+
+        if not stations:
+            self.setDriver('ST', NOT_CONFIGURED)
+        else:
+            self.Notices.clear()
+            for station in self.stations:
+                if station not in stations:
+                    station.close()
+            for station in stations:
+                station.scheduler.enabled = self.adaptive
+                station.scheduler.gust_threshold = self.gust_threshold
+            self.stations = stations
+            workers = min(len(stations), MAX_WORKERS)
+            if self.executor is not None:
+                self.executor.shutdown(wait=False)
+            self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='mbfetch') \
+                if workers > 1 else None
+
+            # at startup the node definitions wait for the sensor probe, so the profile is written once
+            with self.nodedefs_lock:
+                if self.profile_ready:
+                    self.setup_nodedefs(self.units)
+                if self.discovery_done:
+                    self.rebuild_drivers()
+                    # hubs added after discovery get their nodes created in the background
+                    new = [s for s in stations if self.poly.getNode(s.address('temps')) is None]
+                    if new:
+                        threading.Thread(target=self.discover, kwargs={'stations': new}, daemon=True).start()
+            self.configure_listener(int(self.param_float('ListenPort', 0)))
+            LOGGER.info(f'Configuration complete!')
+            self.configured = True
+            self.config_done.set()
+
+    def configure_stations(self):
+        """
+            Build the list of hubs from the custom parameters.  Address and Password configure the
+            first hub, AddressN and PasswordN (N = 2, 3, ...) configure additional hubs.  PasswordN
+            defaults to Password when not set.  Returns an empty list when the first hub is incomplete.
+            Hubs that were already configured keep their state (history, ET0 total, probed sensors,
+            breaker and nodes), only their connection settings are updated.
+        """
+        ip = self.Parameters['Address'] or ''
+        password = self.Parameters['Password'] or ''
 
         # Add notices about missing configuration
-        if self.ip == "":
+        if ip == "":
             self.Notices['ipaddr'] = "IP address or hostname of your MeteoBridge device is required."
-        else:
-            ip_exists = True
-
-        if self.password == "":
+        if password == "":
             self.Notices['Password'] = 'Password for MeteoBridge must be set'
-        else:
-            password_exists = True
+        if ip == "" or password == "":
+            return []
+
+        hubs = [(1, ip, password)]
+        numbers = sorted(int(m.group(1)) for m in (re.fullmatch(r'Address(\d+)', k) for k in self.Parameters)
+                         if m and int(m.group(1)) > 1)
+        for number in numbers:
+            ip = self.Parameters[f'Address{number}'] or ''
+            if ip == '':
+                continue
+            hubs.append((number, ip, self.Parameters[f'Password{number}'] or password))
+
+        current = {station.number: station for station in self.stations}
+        stations = []
+        for number, ip, password in hubs:
+            station = current.get(number) or Station(number, ip, password, self.username, self.timeout)
+            station.configure(ip, password, self.timeout)
+            stations.append(station)
+
+        LOGGER.info(f'Configured Meteobridge hubs: {stations}')
+        return stations
+
+    def configure_store(self, days):
+        # The snapshot store is replaced when the retention changes and removed when set to 0
+        if self.store is not None and self.store.retention == days * 86400:
+            return
+        if self.store is not None:
+            self.store.stop()
+            self.store = None
+        if days > 0:
+            self.store = TimeSeriesStore(retention_days=days)
+            self.store.start()
+
+    def configure_recorder(self, path):
+        # Recording starts, stops or moves to another file when the RecordFile parameter changes
+        if self.recorder is not None and self.recorder.path == path:
+            return
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+        if path:
+            try:
+                self.recorder = Recorder(path)
+            except OSError as err:
+                LOGGER.error(f'Unable to record Meteobridge responses to {path}: {err}')
 
-        if ip_exists and password_exists:
-            self.Notices.clear()
-            self.setup_nodedefs(self.units)
-            LOGGER.info(f'Configuration complete!')
-            self.configured = True
+    def configure_profiler(self, cycles):
+        # Profile the next cycles when the parameter is changed to a number of cycles
+        if cycles == self.profile_cycles:
+            return
+        self.profile_cycles = cycles
+        self.poller.profiler = CycleProfiler(cycles, done=self.profile_done) if cycles > 0 else None
+
+    def profile_done(self):
+        # PG3 keeps the parameter across restarts, clear it so profiling isn't armed again
+        self.profile_cycles = 0
+        self.Parameters['Profile'] = '0'
+
+    def configure_listener(self, port):
+        # The push listener is restarted when the port changes and stopped when set to 0
+        if self.listener is not None and self.listener.port != port:
+            self.listener.stop()
+            self.listener = None
+        if port > 0 and self.listener is None:
+            try:
+                routes = {
+                    '/snapshot.json': lambda: ('application/json', self.snapshots.json()),
+                    '/metrics': lambda: ('text/plain; version=0.0.4', self.snapshots.prometheus()),
+                }
+                self.listener = PushListener(port, self.push_receive, routes).start()
+            except OSError as err:
+                LOGGER.error(f'Unable to listen for Meteobridge pushes on port {port}: {err}')
+                self.Notices['listener'] = f'Unable to listen for Meteobridge pushes on port {port}: {err}'
+                return
+
+        if self.listener is not None:
+            for station in self.stations:
+                LOGGER.info(f'{station.label} push URL: '
+                            f'http://<node server host>:{port}{station.push_path()}?{station.push_schema.template}')
+            self.Notices['listener'] = f'Meteobridge pushes are accepted on port {port}, ' \
+                                       f'the push URL for each hub is in the node server log'
+
+    def warm_start(self):
+        """
+            Load the most recent stored snapshots into each hub's history so a restart starts from real
+            data.  Today's ET0 total is rebuilt from every snapshot since local midnight, which can be
+            more than the history holds.
+        """
+        if self.store is None:
+            return
+        now = time.time()
+        midnight = time.mktime(time.localtime(now)[:3] + (0, 0, 0, 0, 0, -1))
+        for station in self.stations:
+            rows = self.store.read(station.number, min(now - 86400, midnight))
+            recent = len(rows) - station.history.size
+            for index, row in enumerate(rows):
+                if index < recent and row[0] < midnight:
+                    continue
+                obs = Observation(**dict(zip(self.store.names, row[1:])))
+                if index >= recent:
+                    station.history.append(row[0], obs)
+                if row[0] >= midnight:
+                    station.et0.update(row[0], obs)
+            LOGGER.info(f'Loaded {min(len(rows), station.history.size)} stored snapshots into the {station.label} '
+                        f'history, ET0 total for today {station.et0.total:.2f} mm')
+
+    def close_stations(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+        for station in self.stations:
+            station.close()
+
+    def param_float(self, key, default):
+        # Optional numeric parameters fall back to their default when missing or invalid
+        value = self.Parameters[key]
+        if value is None or value == '':
+            return default
+        try:
+            return float(value)
+        except ValueError:
+            LOGGER.error(f'Invalid value for {key}: {value}, using {default}')
+            return default
 
     def setup_nodedefs(self, units):
+        # Called from the PG3 thread (parameter changes) and the poll worker (sensor probes)
+        with self.nodedefs_lock:
+            self._setup_nodedefs(units)
+
+    def _setup_nodedefs(self, units):
+        # The driver lists are built afresh and swapped in, discovery never sees one half updated
+        temperature_list, humidity_list, pressure_list, wind_list = {}, {}, {}, {}
+        rain_list, light_list, lightning_list = {}, {}, {}
+
         # Configure the units for each node driver
-        self.temperature_list['main'] = 'I_TEMP_F' if units == 'us' else 'I_TEMP_C'
-        self.temperature_list['dewpoint'] = 'I_TEMP_F' if units == 'us' else 'I_TEMP_C'
-        self.temperature_list['windchill'] = 'I_TEMP_F' if units == 'us' else 'I_TEMP_C'
-        self.temperature_list['tempmax'] = 'I_TEMP_F' if units == 'us' else 'I_TEMP_C'
-        self.temperature_list['tempmin'] = 'I_TEMP_F' if units == 'us' else 'I_TEMP_C'
-        self.temperature_list['inside'] = 'I_TEMP_F' if units == 'us' else 'I_TEMP_C'
-        self.temperature_list['dewin'] = 'I_TEMP_F' if units == 'us' else 'I_TEMP_C'
-
-        self.humidity_list['main'] = 'I_HUMIDITY'
-        self.humidity_list['max'] = 'I_HUMIDITY'
-        self.humidity_list['min'] = 'I_HUMIDITY'
-        self.humidity_list['inside'] = 'I_HUMIDITY'
-
-        self.pressure_list['station'] = 'I_INHG' if units == 'us' else 'I_MB'
-        self.pressure_list['sealevel'] = 'I_INHG' if units == 'us' else 'I_MB'
-        self.pressure_list['trend'] = 'I_TREND'
-        self.wind_list['windspeed'] = 'I_MPS' if units == 'metric' else 'I_MPH'
-        self.wind_list['gustspeed'] = 'I_MPS' if units == 'metric' else 'I_MPH'
-        self.wind_list['winddir'] = 'I_DEGREE'
-        self.wind_list['winddircard'] = 'I_CARDINAL'
+        temperature_list['main'] = 'I_TEMP_F' if units == 'us' else 'I_TEMP_C'
+        temperature_list['dewpoint'] = 'I_TEMP_F' if units == 'us' else 'I_TEMP_C'
+        temperature_list['windchill'] = 'I_TEMP_F' if units == 'us' else 'I_TEMP_C'
+        temperature_list['tempmax'] = 'I_TEMP_F' if units == 'us' else 'I_TEMP_C'
+        temperature_list['tempmin'] = 'I_TEMP_F' if units == 'us' else 'I_TEMP_C'
+        temperature_list['inside'] = 'I_TEMP_F' if units == 'us' else 'I_TEMP_C'
+        temperature_list['dewin'] = 'I_TEMP_F' if units == 'us' else 'I_TEMP_C'
+
+        humidity_list['main'] = 'I_HUMIDITY'
+        humidity_list['max'] = 'I_HUMIDITY'
+        humidity_list['min'] = 'I_HUMIDITY'
+        humidity_list['inside'] = 'I_HUMIDITY'
+
+        pressure_list['station'] = 'I_INHG' if units == 'us' else 'I_MB'
+        pressure_list['sealevel'] = 'I_INHG' if units == 'us' else 'I_MB'
+        pressure_list['trend'] = 'I_TREND'
+        wind_list['windspeed'] = 'I_MPS' if units == 'metric' else 'I_MPH'
+        wind_list['gustspeed'] = 'I_MPS' if units == 'metric' else 'I_MPH'
+        wind_list['winddir'] = 'I_DEGREE'
+        wind_list['winddircard'] = 'I_CARDINAL'
         if units == 'metric':
-            self.wind_list['windspeed1'] = 'I_KPH'
-            self.wind_list['gustspeed1'] = 'I_KPH'
+            wind_list['windspeed1'] = 'I_KPH'
+            wind_list['gustspeed1'] = 'I_KPH'
         else:
-            self.wind_list['windspeed1'] = 'I_MPH'
-            self.wind_list['gustspeed1'] = 'I_MPH'
-        self.rain_list['rate'] = 'I_MMHR' if units == 'metric' else 'I_INHR'
-        self.rain_list['daily'] = 'I_MM' if units == 'metric' else 'I_INCHES'
-        self.rain_list['24hour'] = 'I_MM' if units == 'metric' else 'I_INCHES'
-        self.rain_list['yesterday'] = 'I_MM' if units == 'metric' else 'I_INCHES'
-        self.rain_list['monthly'] = 'I_MM' if units == 'metric' else 'I_INCHES'
-        self.rain_list['yearly'] = 'I_MM' if units == 'metric' else 'I_INCHES'
-        self.light_list['uv'] = 'I_UV'
-        self.light_list['solar_radiation'] = 'I_RADIATION'
-        self.light_list['evapotranspiration'] = 'I_MM' if units == 'metric' else 'I_INCHES'
-        self.lightning_list['strikes'] = 'I_STRIKES'
-        self.lightning_list['distance'] = 'I_KM' if units == 'metric' else 'I_MILE'
-        self.lightning_list['energy'] = 'I_ENERGY'
+            wind_list['windspeed1'] = 'I_MPH'
+            wind_list['gustspeed1'] = 'I_MPH'
+        rain_list['rate'] = 'I_MMHR' if units == 'metric' else 'I_INHR'
+        rain_list['hourly'] = 'I_MM' if units == 'metric' else 'I_INCHES'
+        rain_list['daily'] = 'I_MM' if units == 'metric' else 'I_INCHES'
+        rain_list['24hour'] = 'I_MM' if units == 'metric' else 'I_INCHES'
+        rain_list['yesterday'] = 'I_MM' if units == 'metric' else 'I_INCHES'
+        rain_list['monthly'] = 'I_MM' if units == 'metric' else 'I_INCHES'
+        rain_list['yearly'] = 'I_MM' if units == 'metric' else 'I_INCHES'
+        light_list['uv'] = 'I_UV'
+        light_list['solar_radiation'] = 'I_RADIATION'
+        light_list['evapotranspiration'] = 'I_MM' if units == 'metric' else 'I_INCHES'
+        light_list['et0_rate'] = 'I_ET0_MMHR' if units == 'metric' else 'I_ET0_INHR'
+        lightning_list['strikes'] = 'I_STRIKES'
+        lightning_list['distance'] = 'I_KM' if units == 'metric' else 'I_MILE'
+        lightning_list['energy'] = 'I_ENERGY'
+        for n in range(1, 10):
+            temperature_list[f'extra{n}'] = 'I_TEMP_F' if units == 'us' else 'I_TEMP_C'
+        temperature_list['soil'] = 'I_TEMP_F' if units == 'us' else 'I_TEMP_C'
+
+        # Only drivers for sensors one of the hubs has go into the node definitions
+        present = set()
+        for station in self.stations:
+            names = {f.name for f in station.fields}
+            fields = station.fields + tuple(f for f in DERIVED_FIELDS if names.intersection(DERIVED_FROM[f.name]))
+            present.update((f.node, key) for f in fields for key in f.drivers)
+        lists = {'temperature_list': temperature_list, 'humidity_list': humidity_list,
+                 'pressure_list': pressure_list, 'wind_list': wind_list, 'rain_list': rain_list,
+                 'light_list': light_list, 'lightning_list': lightning_list}
+        for address, (node_class, name, driver_list) in NODES.items():
+            drivers = lists[driver_list]
+            absent = [key for key in drivers if (address, key) not in present]
+            if len(absent) == len(drivers) and self.node_exists(address):
+                # a node created earlier keeps its definition rather than pointing at a removed nodeDef
+                continue
+            for key in absent:
+                del drivers[key]
+        for driver_list, drivers in lists.items():
+            setattr(self, driver_list, drivers)
+
+        # Compile the conversion plan for each hub from the driver editors
+        editors = {}
+        for address, (node_class, name, driver_list) in NODES.items():
+            drvs = NODE_DRVS[address]
+            editors[address] = {drvs[key]: editor for key, editor in lists[driver_list].items()}
+        for station in self.stations:
+            station.plan = compile_plan(station.schema.targets, editors)
 
         # Build the node definition
         LOGGER.info('Creating node definition profile based on config.')
-        write_profile(self.temperature_list,
-                      self.humidity_list, self.pressure_list, self.wind_list,
-                      self.rain_list, self.light_list, self.lightning_list)
-        time.sleep(3)
+        changed = write_profile(self.temperature_list,
+                                self.humidity_list, self.pressure_list, self.wind_list,
+                                self.rain_list, self.light_list, self.lightning_list)
+        if not changed:
+            LOGGER.info('Node definitions unchanged, profile not pushed to ISY')
+            return
+
         # push updated profile to ISY
         try:
             self.poly.updateProfile()
@@ -396,78 +799,49 @@ class Controller(Node):
 
     # Hub status information here: battery and data health values.
 
-    def stationdata(self, ipaddr, username, password):
+    def stationdata(self, station, schema=None):
         """
             Here we assemble the url and template for the call to the Meteobridge
-            and then unpack the returned data into variables. Simplified in Version 1.2.5 to
-            streamline the basic auth method in requests.get
+            and then unpack the returned data into variables. The request goes through the
+            station's pooled session so the keep-alive connection and basic auth are reused.
         """
         try:
+            schema = schema or station.schema
+            url = schema.url(station.ip)
+            LOGGER.debug("url in getstationdata: {}".format(url))
 
-            values = str(mbtemplate())
-            url = 'http://' + ipaddr + '/cgi-bin/template.cgi?template='
-            LOGGER.debug("url in getstationdata: {}".format(url + values))
-
-            u = requests.get(url + values, auth=(username, password))
+            t0 = time.perf_counter()
+            u = station.session.get(url, timeout=station.timeout)
             mbrdata = u.content.decode('utf-8')
             result_code = u.status_code
+            t1 = time.perf_counter()
+            self.metrics.add('fetch', t1 - t0)
             LOGGER.debug(f'mbrdata is: {mbrdata}, status: {result_code}')
+            if self.recorder is not None:
+                self.recorder.record(time.time(), station.number, schema.template, mbrdata)
             if result_code != 200:
-                LOGGER.error(f'Unable to connect to your Meteobridge device: {result_code}')
+                self.metrics.error()
+                LOGGER.error(f'Unable to connect to your Meteobridge device at {station.ip}: {result_code}')
                 return '', result_code
 
         except OSError as err:
-            LOGGER.error(f"Unable to connect to your Meteobridge device: {err}")
-            return
-
-        mbrarray = mbrdata.split(" ")
-        LOGGER.debug("mbrarray: {}".format(mbrarray))
+            self.metrics.error()
+            LOGGER.error(f"Unable to connect to your Meteobridge device at {station.ip}: {err}")
+            return '', None
 
+        # Values missing from the Meteobridge response (it returns the template token rather than the
+        # actual information) are replaced with zeroes by the parser to avoid type errors during conversions.
         try:
-            temperature = float(mbrarray[0])  # test that there's a valid response
+            obs = schema.parse(mbrdata)
+            self.metrics.add('parse', time.perf_counter() - t1)
 
-        except ValueError or AttributeError as e:
+        except ValueError as e:
+            self.metrics.error()
             LOGGER.error(f"Error in getstationdata: {e}")
-            LOGGER.error("Invalid value")
-            LOGGER.error(mbrarray)
-
-        # Check for invalid responses from Meteobridge and replace them with zeroes to avoid type errors during
-        # conversions from strings to numbers. This can happen when a value is missing from the template request and
-        # the meteobridge returns the template value rather than the actual information.
-
-        for i in range(len(mbrarray)):
-            if "[" in mbrarray[i]:
-                mbrarray[i] = '0'
-        LOGGER.debug("filtered mbrarray: {}".format(mbrarray))
-
-        return mbrarray, result_code
-
-def calculate_et0(obs_data):
-    # Thanks to dwburger for this Python script
-    # dwburger (https://github.com/dwburger/Tempest-ET0/blob/main/Tempest-ET0.py)
-    # modified to suit array configuration from existing package
-    # obs_data = data['obs'][0]
-    LOGGER.debug(f'obs_data in calculate_et0 is: {obs_data}')
-
-    air_temp = (float(obs_data[3])+float(obs_data[4])) / 2
-    wind_speed = float(obs_data[17])
-    rel_humidity = (float(obs_data[8]) + float(obs_data[9])) / 2
-
-    # Check if solar radiation data is available; use 0 if None
-    solar_radiation_raw = float(obs_data[14])
-    solar_radiation = solar_radiation_raw * 0.0864 if solar_radiation_raw is not None else 0  # MJ/m^2/day conversion
-
-    ALBEDO = 0.23
-    G = 0.0
-    PSY_CONST = 0.665e-3
-    es = 0.6108 * (10 ** ((7.5 * air_temp) / (237.3 + air_temp)))
-    ea = es * (rel_humidity / 100.0)
-    delta = (4098.0 * es) / ((air_temp + 237.3) ** 2)
-    Rn = (1 - ALBEDO) * solar_radiation - 0.34 * (1.35 * solar_radiation / 2.3 - 1.0)
-    et0_daily = (0.408 * delta * (Rn - G) + PSY_CONST * (900 / (air_temp + 273)) * wind_speed * (es - ea)) / (
-                delta + PSY_CONST * (1 + 0.34 * wind_speed))
-
-    et0_hourly = et0_daily / 24  # Daily to hourly ET0
-    # et0_in_inches = et0_hourly / 25.4  # Convert mm to inches
-    LOGGER.debug("et0 calculated: {}".format(et0_daily))
-    return et0_daily # mm/hour
\ No newline at end of file
+            LOGGER.error(mbrdata)
+            return '', None
+
+        LOGGER.debug(f"parsed observation: {obs}")
+
+        return obs, result_code
+
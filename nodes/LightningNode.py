@@ -3,39 +3,14 @@
 Polyglot v3 node server for Meteobridge
 Copyright (C) 2021 Gordon Larsen
 """
-from udi_interface import Node, LOGGER
-from constants import LTNG_DRVS, UOM
+from constants import LTNG_DRVS
+from nodes.WeatherNode import WeatherNode
 
 
-class LightningNode(Node):
+class LightningNode(WeatherNode):
     id = 'lightning'
-    units = 'metric'
-    drivers = []
+    drvs = LTNG_DRVS
     hint = [1, 0x0b, 1, 0]
 
     def __init__(self, polyglot, parent, address, name):
         super(LightningNode, self).__init__(polyglot, parent, address, name)
-
-    def set_Driver(self, driver, value, units=None):
-
-        if driver == 'GV0':
-            distance = value
-            if self.units == 'us':
-                value = round(distance / 1.6, 1)
-
-        super(LightningNode, self).setDriver(driver, round(value, 1))
-
-    def define_drivers(self, driver_list):
-        LOGGER.debug(f'Driver_list: {driver_list}')
-
-        for d in driver_list:
-            LightningNode.drivers.append(
-                {
-                    'driver': LTNG_DRVS[d],
-                    'value': 0,
-                    'uom': UOM[driver_list[d]]
-                })
-
-        LOGGER.debug(f'Lightning Node drivers = {LightningNode.drivers}')
-
-        return LightningNode.drivers
\ No newline at end of file
@@ -0,0 +1,30 @@
+# !/usr/bin/env python3
+"""
+Polyglot v3 node server for Meteobridge
+Copyright (C) 2021 Gordon Larsen
+"""
+from udi_interface import LOGGER, Node
+from constants import UOM
+
+
+class WeatherNode(Node):
+    """ Base for the weather nodes, drvs maps the driver list keys to the node's driver ids """
+    drivers = ()
+    drvs = {}
+
+    def define_drivers(self, driver_list):
+        """
+            Build this node's driver table from the configured driver list.  The table is rebuilt, not
+            appended to, so rediscovery and configuration changes leave it the same size.
+        """
+        LOGGER.debug(f'Driver_list: {driver_list}')
+        self.drivers = tuple(
+            {
+                'driver': self.drvs[d],
+                'value': 0,
+                'uom': UOM[driver_list[d]]
+            } for d in driver_list)
+
+        LOGGER.debug(f'{self.name} node drivers {self.drivers}')
+
+        return self.drivers
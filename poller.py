@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Background poll pipeline.
+
+The Poller runs each poll cycle on a dedicated worker thread so the PG3 message
+loop never waits on the Meteobridge.  A cycle fetches a snapshot and hands it to
+the publish stage.  If a poll is triggered while the previous cycle is still
+running it is skipped and counted rather than queued behind it.
+
+A profiler (see profiler.py) can be attached to wrap the next cycles.
+
+Copyright 2021 Robert Paauwe and Gordon Larsen, MIT License
+"""
+import threading
+
+from udi_interface import LOGGER
+
+
+class Poller:
+    def __init__(self, fetch, publish, name='mbpoller'):
+        self.fetch = fetch
+        self.publish = publish
+        self.name = name
+        self.busy = False
+        self.skipped = 0
+        self.completed = 0
+        self.profiler = None
+
+        self._args = ()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping = True
+        self._wake.set()
+
+    def trigger(self, *args):
+        """
+            Request a poll cycle without blocking, args are passed on to fetch.  Returns False if
+            the poll was skipped.
+        """
+        if self.busy or self._wake.is_set():
+            self.skipped += 1
+            LOGGER.warning(f'Previous poll still running, poll skipped ({self.skipped} skipped so far)')
+            return False
+
+        self._args = args
+        self._wake.set()
+        return True
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            if self._stopping:
+                break
+
+            self.busy = True
+            self._wake.clear()
+            profiler = self.profiler
+            if profiler is not None:
+                profiler.begin()
+            try:
+                snapshot = self.fetch(*self._args)
+                if snapshot is not None:
+                    self.publish(snapshot)
+            except Exception as error:
+                LOGGER.error(f'Poll cycle failed: {type(error)} - {error}')
+            finally:
+                if profiler is not None and profiler.end():
+                    self.profiler = None
+                self.busy = False
+                self.completed += 1
+
+        LOGGER.debug(f'{self.name} stopped after {self.completed} cycles, {self.skipped} skipped')
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+On demand profiling of poll cycles.
+
+Setting the Profile custom parameter to N profiles the next N poll cycles on the
+poller's worker thread with cProfile and tracemalloc.  When they are done the
+sorted statistics and the top allocation sites are written to the node server's
+directory, profiling switches itself off and the done callback clears the
+parameter so a restart doesn't profile again.  While it is off the poller only
+checks for a profiler once per cycle.
+
+Copyright 2021 Robert Paauwe and Gordon Larsen, MIT License
+"""
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+
+from udi_interface import LOGGER
+
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 25
+
+
+class CycleProfiler:
+    def __init__(self, cycles, directory='.', done=None):
+        self.remaining = cycles
+        self.cycles = cycles
+        self.directory = directory
+        self.done = done
+        self.profile = cProfile.Profile()
+        self._tracing = False
+        self._before = None
+
+    def begin(self):
+        if self._before is None:
+            self._tracing = not tracemalloc.is_tracing()
+            if self._tracing:
+                tracemalloc.start()
+            self._before = tracemalloc.take_snapshot()
+            LOGGER.warning(f'Profiling the next {self.cycles} poll cycles')
+        self.profile.enable()
+
+    def end(self):
+        """ Called after each cycle, returns True once the last cycle is done and the reports are written """
+        self.profile.disable()
+        self.remaining -= 1
+        if self.remaining > 0:
+            return False
+
+        after = tracemalloc.take_snapshot()
+        if self._tracing:
+            tracemalloc.stop()
+        self.write(after)
+        if self.done is not None:
+            self.done()
+        return True
+
+    def write(self, after):
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        path = f'{self.directory}/profile-{stamp}'
+        try:
+            self.profile.dump_stats(path + '.prof')
+            text = io.StringIO()
+            stats = pstats.Stats(self.profile, stream=text)
+            stats.sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+            with open(path + '.txt', 'w') as out:
+                out.write(f'{self.cycles} poll cycles\n')
+                out.write(text.getvalue())
+
+            allocations = after.compare_to(self._before, 'lineno')[:TOP_ALLOCATIONS]
+            with open(f'{self.directory}/allocations-{stamp}.txt', 'w') as out:
+                out.write(f'Top allocation sites over {self.cycles} poll cycles\n')
+                out.writelines(f'{stat}\n' for stat in allocations)
+        except OSError as err:
+            LOGGER.error(f'Unable to write the profile reports: {err}')
+            return
+        LOGGER.warning(f'Profiling done, reports written to {path}.txt and {self.directory}/allocations-{stamp}.txt')
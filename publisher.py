@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Change detection for driver updates.
+
+The Publisher remembers the last value sent for each (node, driver) and only
+sends a value to the node when it changed by more than the driver's deadband
+or a full refresh is due.  Counters of sent and suppressed updates are kept so the
+savings can be seen in the log.
+
+In batch mode the values are staged on the nodes with setDriver(report=False) and
+flushed at the end of the cycle with one PG3 status message per node, instead of
+one message per driver.
+
+Copyright 2021 Robert Paauwe and Gordon Larsen, MIT License
+"""
+import time
+
+from udi_interface import LOGGER
+
+from constants import DEADBANDS, REFRESH_INTERVAL
+
+
+class Publisher:
+    def __init__(self, refresh=REFRESH_INTERVAL, deadbands=DEADBANDS, batch=True):
+        self.refresh = refresh
+        self.deadbands = deadbands
+        self.batch = batch
+        self.staged = {}  # node address: (node, [driver ids]) waiting for the flush
+        self.last = {}
+        self.last_refresh = None
+        self.full_refresh = True
+
+        self.sent = 0
+        self.suppressed = 0
+        self.cycle_sent = 0
+        self.cycle_suppressed = 0
+        self.messages = 0
+        self.cycle_messages = 0
+        self.cycle_time = 0.0
+
+    def reset(self, refresh=None):
+        # Forget what was sent so the next cycle publishes every driver, e.g. after a units change
+        if refresh is not None:
+            self.refresh = refresh
+        self.last.clear()
+        self.last_refresh = None
+
+    def begin(self):
+        """ Start a poll cycle, deciding whether this cycle is a full refresh. """
+        now = time.monotonic()
+        self.full_refresh = self.last_refresh is None or now - self.last_refresh >= self.refresh
+        if self.full_refresh:
+            self.last_refresh = now
+        self.cycle_sent = 0
+        self.cycle_suppressed = 0
+        self.cycle_messages = 0
+        self.cycle_time = 0.0
+
+    def end(self):
+        self.flush()
+        LOGGER.info(f'Published {self.cycle_sent} driver updates in {self.cycle_messages} messages, '
+                    f'suppressed {self.cycle_suppressed} '
+                    f'(totals: {self.sent} sent, {self.suppressed} suppressed, {self.messages} messages)')
+
+    def flush(self):
+        """ Report the staged drivers, one status message per node """
+        t0 = time.perf_counter()
+        for address, (node, staged) in self.staged.items():
+            drivers = {d['driver']: d for d in node.drivers}
+            entries = [{'address': address, 'driver': driver, 'value': str(drivers[driver]['value']),
+                        'uom': drivers[driver]['uom'], 'text': drivers[driver].get('text')}
+                       for driver in staged if driver in drivers]
+            if entries:
+                node.poly.send({'set': entries}, 'status')
+                self.messages += 1
+                self.cycle_messages += 1
+        self.staged.clear()
+        self.cycle_time += time.perf_counter() - t0
+
+    def unchanged(self, node, driver, value):
+        key = (node.address, driver)
+        if self.full_refresh or key not in self.last:
+            return False
+
+        last = self.last[key]
+        if value == last:
+            return True
+
+        band = self.deadbands.get(node.id, {}).get(driver, 0)
+        if band and isinstance(value, (int, float)) and isinstance(last, (int, float)):
+            # small tolerance so a change of exactly one deadband step is still suppressed
+            return abs(value - last) <= band + 1e-9
+
+        return False
+
+    def publish(self, node, driver, value, convert=None):
+        """
+            Send value to the node's driver if it changed.  Change detection works on the raw
+            Meteobridge value, convert is only applied to values that are sent.  None (a value
+            the hub doesn't have) is not sent.
+        """
+        if value is None:
+            return False
+        if self.unchanged(node, driver, value):
+            self.suppressed += 1
+            self.cycle_suppressed += 1
+            return False
+
+        t0 = time.perf_counter()
+        self.last[(node.address, driver)] = value
+        value = value if convert is None else convert(value)
+        if self.batch:
+            node.setDriver(driver, value, report=False)
+            self.staged.setdefault(node.address, (node, []))[1].append(driver)
+        else:
+            # setDriver only reports a value that differs from the node's, unless forced
+            current = next((d for d in node.drivers if d['driver'] == driver), None)
+            reported = current is not None and (self.full_refresh or current['value'] != value)
+            node.setDriver(driver, value, force=self.full_refresh)
+            if reported:
+                self.messages += 1
+                self.cycle_messages += 1
+        self.sent += 1
+        self.cycle_sent += 1
+        self.cycle_time += time.perf_counter() - t0
+        return True
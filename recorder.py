@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Recording of raw Meteobridge responses.
+
+With the RecordFile parameter set, every template.cgi response (and push) is
+appended to a gzip file as one line: the time, the hub number, the template
+that was requested and the raw response, separated by tabs.  The template is
+repeated on every line so each record stands on its own, gzip takes care of the
+repetition.  bench/replay.py feeds a recording back through the node server.
+
+Copyright 2021 Robert Paauwe and Gordon Larsen, MIT License
+"""
+import gzip
+import threading
+import zlib
+from functools import lru_cache
+
+from udi_interface import LOGGER
+
+from constants import TEMPLATE_FIELDS, EXTRA_FIELDS
+from template import TemplateSchema
+
+FLUSH_EVERY = 10  # records between flushes, a crash loses at most these
+
+
+class Recorder:
+    def __init__(self, path):
+        self.path = path
+        self.records = 0
+        self._lock = threading.Lock()  # hubs are fetched concurrently, pushes arrive on their own threads
+        self._file = gzip.open(path, 'at', encoding='utf-8')
+        LOGGER.info(f'Recording Meteobridge responses to {path}')
+
+    def record(self, timestamp, number, template, text):
+        line = f'{timestamp:.3f}\t{number}\t{template}\t{text.rstrip()}\n'
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line)
+            self.records += 1
+            if self.records % FLUSH_EVERY == 0:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        LOGGER.info(f'Recorded {self.records} responses to {self.path}')
+
+
+def read_records(path):
+    """ Yield (timestamp, hub number, template, response) from a recording, oldest first """
+    with gzip.open(path, 'rt', encoding='utf-8') as recording:
+        try:
+            for line in recording:
+                parts = line.rstrip('\n').split('\t')
+                if len(parts) == 4:
+                    yield float(parts[0]), int(parts[1]), parts[2], parts[3]
+        except (EOFError, zlib.error):
+            # the recorder was stopped without closing the file, the last records are lost
+            LOGGER.warning(f'{path} ends early, it was not closed by the recorder')
+
+
+@lru_cache(maxsize=32)
+def schema_for(template):
+    """ Template schema for a recorded template, from the fields the template was built from """
+    fields = {f.token: f for f in TEMPLATE_FIELDS + EXTRA_FIELDS}
+    return TemplateSchema(fields[token] for token in template.split('%20'))
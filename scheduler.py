@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Adaptive poll scheduling.
+
+While the weather is active (rain falling, lightning strike count rising, gusts over
+the threshold or pressure falling) a hub is polled on every short poll.  When it is
+calm the hub backs off and is only polled on the long poll.
+
+Copyright 2021 Robert Paauwe and Gordon Larsen, MIT License
+"""
+from udi_interface import LOGGER
+
+from constants import GUST_THRESHOLD
+
+
+class AdaptiveScheduler:
+    def __init__(self, name, enabled=True, gust_threshold=GUST_THRESHOLD):
+        self.name = name
+        self.enabled = enabled
+        self.gust_threshold = gust_threshold
+        self.active = True  # poll fast until the first snapshot says otherwise
+        self.reasons = ()
+        self.last_strikes = None
+
+    def due(self, polltype):
+        """ Is a poll of this hub due on this PG3 poll (shortPoll or longPoll) """
+        if 'longPoll' in polltype:
+            return True
+        return self.active or not self.enabled
+
+    def update(self, obs):
+        # values of sensors the hub doesn't have are None
+        reasons = []
+        if (obs.rain_rate or 0) > 0:
+            reasons.append('rain')
+        if None not in (self.last_strikes, obs.lgt_strikes) and obs.lgt_strikes > self.last_strikes:
+            reasons.append('lightning')
+        if (obs.gust or 0) >= self.gust_threshold:
+            reasons.append('gusts')
+        if (obs.press_trend or 0) < 0:
+            reasons.append('falling pressure')
+        self.last_strikes = obs.lgt_strikes
+
+        active = len(reasons) > 0
+        if active != self.active and self.enabled:
+            if active:
+                LOGGER.info(f'{self.name}: weather active ({", ".join(reasons)}), polling on every short poll')
+            else:
+                LOGGER.info(f'{self.name}: weather calm, polling on long poll only')
+        self.active = active
+        self.reasons = tuple(reasons)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Latest snapshot of each hub for local consumers.
+
+Dashboards and scripts can read the plugin's latest data from the push listener
+instead of polling the Meteobridge themselves: /snapshot.json as JSON and /metrics
+in the Prometheus text exposition format.  The responses are rendered once per
+publish into immutable byte strings, a read only inserts the snapshot's age.
+
+Copyright 2021 Robert Paauwe and Gordon Larsen, MIT License
+"""
+import json
+import time
+
+PREFIX = 'meteobridge_'
+
+
+class SnapshotCache:
+    def __init__(self):
+        self.latest = {}  # hub number: (timestamp, obs)
+        # (JSON parts per hub as (head, timestamp, tail) with the age going in between,
+        #  Prometheus text without the ages, (hub number, timestamp) per hub)
+        self._rendered = ((), b'', ())
+
+    def update(self, number, timestamp, obs):
+        """ Render the responses for a new snapshot, called from the publish path """
+        self.latest[number] = (timestamp, obs)
+        hubs = sorted(self.latest.items())
+
+        parts = []
+        for hub, (ts, snapshot) in hubs:
+            values = {name: value for name, value in snapshot._asdict().items() if value is not None}
+            head = f'{{"hub": {hub}, "timestamp": {ts:.3f}, "age": '.encode()
+            tail = f', "values": {json.dumps(values)}}}'.encode()
+            parts.append((head, ts, tail))
+
+        lines = []
+        names = [name for name, value in hubs[0][1][1]._asdict().items() if not isinstance(value, str)]
+        for name in names:
+            samples = [(hub, getattr(snapshot, name)) for hub, (ts, snapshot) in hubs]
+            samples = [(hub, value) for hub, value in samples if value is not None]
+            if samples:
+                lines.append(f'# TYPE {PREFIX}{name} gauge')
+                lines.extend(f'{PREFIX}{name}{{hub="{hub}"}} {value}' for hub, value in samples)
+        lines.append(f'# TYPE {PREFIX}snapshot_timestamp_seconds gauge')
+        lines.extend(f'{PREFIX}snapshot_timestamp_seconds{{hub="{hub}"}} {ts:.3f}' for hub, (ts, obs) in hubs)
+        lines.append(f'# TYPE {PREFIX}snapshot_age_seconds gauge\n')
+
+        # swapped in one assignment so readers never see a partial update
+        self._rendered = (tuple(parts), '\n'.join(lines).encode(), tuple((hub, ts) for hub, (ts, obs) in hubs))
+
+    def json(self, now=None):
+        now = time.time() if now is None else now
+        body = b', '.join(head + f'{now - ts:.1f}'.encode() + tail for head, ts, tail in self._rendered[0])
+        return b'{"hubs": [' + body + b']}'
+
+    def prometheus(self, now=None):
+        now = time.time() if now is None else now
+        json_parts, metrics, times = self._rendered
+        ages = ''.join(f'{PREFIX}snapshot_age_seconds{{hub="{hub}"}} {now - ts:.1f}\n' for hub, ts in times)
+        return metrics + ages.encode()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Per hub state for the Meteobridge node server.
+
+Each configured Meteobridge is a Station with its own connection pool, template
+schema and node group.  The first hub keeps the original node addresses, further
+hubs prefix their node addresses (mb2temps, mb3temps, ...) so several hubs can be
+served by one plugin instance.
+
+A capability probe at startup, on configuration changes and once a day finds the
+sensors the hub has.  Only those are requested; until the first probe succeeds
+the standard fields are requested.
+
+Pushes always use the fixed push template with every known field, so the URL
+configured on the hub doesn't depend on the probe; fields the hub leaves
+unfilled are None.
+
+Polls request only the template tiers that are due (see TIER_INTERVALS), each set
+of tiers has its own cached schema and URL.  Values of the slower tiers are kept
+from the last request that included them and merged into every snapshot.
+
+Copyright 2021 Robert Paauwe and Gordon Larsen, MIT License
+"""
+import socket
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from udi_interface import LOGGER
+
+from breaker import CircuitBreaker
+from constants import CONNECT_TIMEOUT, READ_TIMEOUT, TEMPLATE_FIELDS, EXTRA_FIELDS, TIER_INTERVALS, \
+    SENSOR_PROBE_INTERVAL
+from et0 import ET0Accumulator
+from history import History
+from scheduler import AdaptiveScheduler
+from template import TemplateSchema
+
+# the template logged for the hub's push URL, independent of the probed sensors
+PUSH_SCHEMA = TemplateSchema(TEMPLATE_FIELDS + EXTRA_FIELDS, optional=True)
+
+
+class Station:
+    def __init__(self, number, ip, password, username='meteobridge', timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)):
+        self.number = number
+        self.ip = ip
+        self.password = password
+        self.username = username
+        self.timeout = timeout
+
+        self.primary = number == 1
+        self.prefix = '' if self.primary else f'mb{number}'
+        self.label = 'Meteobridge' if self.primary else f'Meteobridge {number}'
+
+        self.schema = TemplateSchema()  # template of the probed sensors, used for the publish targets
+        self.push_schema = PUSH_SCHEMA
+        self.schemas = {}  # tiers requested: schema for those tiers
+        self.tier_times = {}  # tier: monotonic time it was last requested
+        self.cached = {}  # slow tier values from the last request that included them
+        self.sensors = None  # names of the fields the hub fills in, None until probed
+        self.probed = None  # monotonic time of the last capability probe
+        self.scheduler = AdaptiveScheduler(self.label)
+        self.plan = {}  # conversion plan, {address: ((field, driver, converter), ...)}
+        self.history = History(TEMPLATE_FIELDS)
+        self.et0 = ET0Accumulator(self.label)
+        self.breaker = CircuitBreaker(self.label)
+        self.session = None
+        self.nodes = {}  # node registry, base address: node instance
+        self.last_wind_dir = 0
+        self.last_push = None  # monotonic time of the last push received from this hub
+        self.sources = None  # addresses the hub's host name resolves to, for checking pushes
+
+    def __repr__(self):
+        return f'Station({self.number}, {self.ip})'
+
+    def address(self, base):
+        return self.prefix + base
+
+    def node_name(self, name):
+        return name if self.primary else f'{self.label} {name}'
+
+    def pushing(self, timeout):
+        # True while the hub keeps pushing data, polling is only the fallback then
+        return self.last_push is not None and time.monotonic() - self.last_push < timeout
+
+    @property
+    def fields(self):
+        if self.sensors is None:
+            return TEMPLATE_FIELDS
+        return tuple(f for f in TEMPLATE_FIELDS + EXTRA_FIELDS if f.name in self.sensors)
+
+    def accepts(self, client):
+        """
+            True if a push from the client address comes from this hub.  The hub's host name is
+            resolved once and again when a push doesn't match, in case its address changed.
+        """
+        if self.sources is not None and client in self.sources:
+            return True
+        host = urlsplit('http://' + self.ip).hostname
+        try:
+            self.sources = {info[4][0] for info in socket.getaddrinfo(host, None)}
+        except (OSError, UnicodeError) as err:
+            LOGGER.error(f'Unable to resolve {self.label} address {host}: {err}')
+            self.sources = None
+            return False
+        return client in self.sources
+
+    def probe_due(self):
+        return self.probed is None or time.monotonic() - self.probed >= SENSOR_PROBE_INTERVAL
+
+    def set_sensors(self, sensors):
+        """ Record the probed sensors, returns True if they changed """
+        self.probed = time.monotonic()
+        if sensors == self.sensors:
+            return False
+        self.sensors = sensors
+        self.schema = TemplateSchema(self.fields)
+        # slow values of removed sensors must not be merged into later snapshots
+        self.schemas.clear()
+        self.cached.clear()
+        self.tier_times.clear()
+        return True
+
+    def poll_schema(self, long=False):
+        """ Schema for a poll, with the tiers that are due.  On a long poll every tier is due. """
+        now = time.monotonic()
+        tiers = tuple(tier for tier, interval in TIER_INTERVALS.items()
+                      if long or not interval or tier not in self.tier_times
+                      or now - self.tier_times[tier] >= interval)
+        schema = self.schemas.get(tiers)
+        if schema is None:
+            schema = TemplateSchema(f for f in self.fields if f.tier in tiers)
+            self.schemas[tiers] = schema
+        return schema
+
+    def merge_tiers(self, schema, obs):
+        """ Remember the slow values the snapshot carries and fill in the ones it doesn't """
+        now = time.monotonic()
+        for tier in schema.tiers:
+            self.tier_times[tier] = now
+        for field in schema.fields:
+            if TIER_INTERVALS[field.tier]:
+                self.cached[field.name] = getattr(obs, field.name)
+        return obs._replace(**self.cached)
+
+    def configure(self, ip, password, timeout):
+        """
+            Apply the hub's parameters.  The session is only rebuilt when the connection settings
+            change, a new address may be a different hub so its sensors are probed again.  A new
+            address or password is tried straight away, whatever the breaker state.
+        """
+        if ip != self.ip:
+            self.probed = None
+            self.sources = None
+        if (ip, password) != (self.ip, self.password):
+            self.breaker.reset()
+        changed = (ip, password, timeout) != (self.ip, self.password, self.timeout)
+        self.ip, self.password, self.timeout = ip, password, timeout
+        if changed or self.session is None:
+            self.new_session()
+
+    def push_path(self):
+        return '/push' if self.primary else f'/push/{self.number}'
+
+    def url(self, template):
+        return 'http://' + self.ip + '/cgi-bin/template.cgi?template=' + template
+
+    def new_session(self):
+        """
+            Build the pooled keep-alive session used for every call to this Meteobridge. Basic auth is
+            attached to the session so it isn't rebuilt per request. Any previous session is closed so
+            parameter changes start from a clean connection pool.
+        """
+        self.close()
+
+        session = requests.Session()
+        session.auth = (self.username, self.password)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=0)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        self.session = session
+        LOGGER.debug(f'New session for {self}, timeouts (connect, read): {self.timeout}')
+
+    def close(self):
+        if self.session is not None:
+            self.session.close()
+            self.session = None
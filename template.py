@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Template schema for Meteobridge requests.
+
+A TemplateSchema is built once at configuration time from the field list in
+constants.py.  It caches the template string and request URL, knows which node
+driver each field is published to, and parses a Meteobridge response into an
+Observation record in a single pass.
+
+Copyright 2021 Robert Paauwe and Gordon Larsen, MIT License
+"""
+from collections import namedtuple
+
+from constants import TEMPLATE_FIELDS, EXTRA_FIELDS, DERIVED_FIELDS, CARDINAL_WIND_DIR_MAP, NODE_DRVS, mbtemplate
+
+# Typed record holding one value per schema and derived field; fields not requested are None
+Observation = namedtuple('Observation', [field.name for field in TEMPLATE_FIELDS + EXTRA_FIELDS + DERIVED_FIELDS])
+Observation.__new__.__defaults__ = (None,) * len(Observation._fields)
+
+
+def _int(value):
+    return int(float(value))
+
+
+def _cardinal(value):
+    # Meteobridge sometimes returns a nul string for wind0dir-act=endir, the KeyError marks it as missing
+    return CARDINAL_WIND_DIR_MAP[value]
+
+
+CONVERTERS = {
+    'float': float,
+    'int': _int,
+    'str': str,
+    'cardinal': _cardinal,
+}
+
+# Value used when the Meteobridge returns the unfilled template token or an invalid value
+DEFAULTS = {
+    'float': 0.0,
+    'int': 0,
+    'str': '',
+    'cardinal': None,
+}
+
+
+class TemplateSchema:
+    def __init__(self, fields=TEMPLATE_FIELDS, optional=False):
+        """
+            With optional set, values the hub doesn't fill in parse as None rather than the type's
+            default, for templates that ask for sensors the hub may not have.
+        """
+        self.fields = tuple(fields)
+        self.tiers = tuple(sorted({f.tier for f in self.fields}))
+        self.template = mbtemplate(self.fields)
+        self._plan = tuple((f.name, CONVERTERS[f.type], None if optional else DEFAULTS[f.type]) for f in self.fields)
+        self._host = None
+        self._url = None
+
+        # Publish targets grouped by node address: {address: ((field name, driver id), ...)}
+        targets = {}
+        for f in self.fields + DERIVED_FIELDS:
+            for key in f.drivers:
+                targets.setdefault(f.node, []).append((f.name, NODE_DRVS[f.node][key]))
+        self.targets = {address: tuple(t) for address, t in targets.items()}
+
+    @staticmethod
+    def present(text, fields):
+        """ Names of the fields the hub filled in, from a response to the fields' template """
+        values = text.rstrip('\r\n').split(' ')
+        if len(values) < len(fields):
+            raise ValueError(f'Expected {len(fields)} values, received {len(values)}')
+        return frozenset(f.name for f, raw in zip(fields, values) if '[' not in raw)
+
+    def url(self, ipaddr):
+        if ipaddr != self._host:
+            self._url = 'http://' + ipaddr + '/cgi-bin/template.cgi?template=' + self.template
+            self._host = ipaddr
+        return self._url
+
+    def parse(self, text):
+        """
+            Split the response once and convert each value with the field's type.  Values the
+            Meteobridge could not fill in (the template token is echoed back) or that don't convert
+            are replaced with the type's default.
+        """
+        values = text.rstrip('\r\n').split(' ')
+        if len(values) < len(self._plan):
+            raise ValueError(f'Expected {len(self._plan)} values, received {len(values)}')
+
+        record = {}
+        for (name, convert, default), raw in zip(self._plan, values):
+            if '[' in raw:
+                record[name] = default
+                continue
+            try:
+                record[name] = convert(raw)
+            except (ValueError, KeyError):
+                record[name] = default
+
+        return Observation(**record)
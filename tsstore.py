@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+On-disk time-series store for poll snapshots.
+
+Snapshots are queued by the poll path and written in batches by a background
+writer thread to an SQLite database in WAL mode, so the poll never waits on the
+disk.  Rows older than the retention period are pruned by the writer.  Reads use
+their own connection and can downsample into time buckets in SQL.  At startup the
+stored history warms up the in-memory History so derived values start from real
+data.
+
+Copyright 2021 Robert Paauwe and Gordon Larsen, MIT License
+"""
+import queue
+import sqlite3
+import threading
+import time
+
+from udi_interface import LOGGER
+
+from constants import TEMPLATE_FIELDS, STORE_FILE, STORE_BATCH, STORE_FLUSH_INTERVAL, STORE_RETENTION_DAYS
+from history import NUMERIC_TYPES
+
+PRUNE_INTERVAL = 3600  # seconds between retention checks
+
+
+class TimeSeriesStore:
+    def __init__(self, path=STORE_FILE, fields=TEMPLATE_FIELDS, retention_days=STORE_RETENTION_DAYS,
+                 batch=STORE_BATCH, flush_interval=STORE_FLUSH_INTERVAL):
+        self.path = path
+        self.names = tuple(f.name for f in fields if f.type in NUMERIC_TYPES)
+        self.retention = retention_days * 86400
+        self.batch = batch
+        self.flush_interval = flush_interval
+        self.written = 0
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._insert = 'INSERT INTO obs (station, ts, {}) VALUES (?, ?, {})'.format(
+            ', '.join(self.names), ', '.join('?' * len(self.names)))
+
+    def connect(self):
+        db = sqlite3.connect(self.path, timeout=10)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        return db
+
+    def setup(self, db):
+        db.execute('CREATE TABLE IF NOT EXISTS obs (station INTEGER NOT NULL, ts REAL NOT NULL)')
+        db.execute('CREATE INDEX IF NOT EXISTS obs_station_ts ON obs (station, ts)')
+        # columns are added as fields are added to the template schema
+        existing = {row[1] for row in db.execute('PRAGMA table_info(obs)')}
+        for name in self.names:
+            if name not in existing:
+                db.execute(f'ALTER TABLE obs ADD COLUMN {name} REAL')
+        db.commit()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        db = self.connect()
+        self.setup(db)
+        db.close()
+        self._thread = threading.Thread(target=self._run, name='mbstore', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def add(self, station, timestamp, obs):
+        """ Queue a snapshot for the writer, called from the poll path """
+        self._queue.put((station, timestamp) + tuple(getattr(obs, name) for name in self.names))
+
+    def _run(self):
+        db = self.connect()
+        rows = []
+        last_flush = last_prune = time.monotonic()
+        stopping = False
+        while not stopping:
+            try:
+                row = self._queue.get(timeout=self.flush_interval)
+                if row is None:
+                    stopping = True
+                else:
+                    rows.append(row)
+            except queue.Empty:
+                pass
+
+            now = time.monotonic()
+            if rows and (stopping or len(rows) >= self.batch or now - last_flush >= self.flush_interval):
+                self._write(db, rows)
+                rows = []
+                last_flush = now
+            if self.retention and now - last_prune >= PRUNE_INTERVAL:
+                self._prune(db)
+                last_prune = now
+        db.close()
+
+    def _write(self, db, rows):
+        try:
+            with db:
+                db.executemany(self._insert, rows)
+            self.written += len(rows)
+            LOGGER.debug(f'Stored {len(rows)} snapshots in {self.path}')
+        except sqlite3.Error as error:
+            LOGGER.error(f'Unable to store snapshots in {self.path}: {error}')
+
+    def _prune(self, db):
+        try:
+            with db:
+                db.execute('DELETE FROM obs WHERE ts < ?', (time.time() - self.retention,))
+        except sqlite3.Error as error:
+            LOGGER.error(f'Unable to prune {self.path}: {error}')
+
+    def write(self, rows):
+        """ Write rows of (station, ts, field values...) directly, used by jobs off the poll path """
+        db = self.connect()
+        self._write(db, rows)
+        db.close()
+
+    def read(self, station, since, until=None, bucket=None, names=None):
+        """
+            Rows of (ts, values...) for a hub between since and until, oldest first.  With bucket
+            (seconds) the rows are averaged into buckets of that length.
+        """
+        names = names or self.names
+        until = until or time.time()
+        db = self.connect()
+        try:
+            if bucket:
+                columns = ', '.join(f'AVG({name})' for name in names)
+                rows = db.execute(f'SELECT CAST(ts / ? AS INTEGER) * ? AS bucket, {columns} FROM obs '
+                                  'WHERE station = ? AND ts >= ? AND ts <= ? GROUP BY bucket ORDER BY bucket',
+                                  (bucket, bucket, station, since, until)).fetchall()
+            else:
+                rows = db.execute(f'SELECT ts, {", ".join(names)} FROM obs '
+                                  'WHERE station = ? AND ts >= ? AND ts <= ? ORDER BY ts',
+                                  (station, since, until)).fetchall()
+        finally:
+            db.close()
+        return rows
+
+    def last_time(self, station):
+        db = self.connect()
+        try:
+            return db.execute('SELECT MAX(ts) FROM obs WHERE station = ?', (station,)).fetchone()[0]
+        finally:
+            db.close()
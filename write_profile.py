@@ -1,13 +1,18 @@
 #!/usr/bin/env python3
 
-import collections
-from udi_interface import LOGGER
+import hashlib
 import os
+import tempfile
+
+from udi_interface import LOGGER
 import constants as uom
 
 pfx = "write_profile:"
 
 VERSION_FILE = "profile/version.txt"
+NODEDEF_FILE = "profile/nodedef/nodedefs.xml"
+
+_digests = {}  # path: sha256 of the content last written
 
 # define templates for the various sensor nodes we have available. Each
 # sensor node will have a pre-defined list of drivers. When we build
@@ -26,95 +31,135 @@ STATUS_TMPL = "      <st id=\"%s\" editor=\"%s\" />\n"
 
 def write_profile(temperature_list, humidity_list, pressure_list,
                   wind_list, rain_list, light_list, lightning_list):
-
-    LOGGER.info("{0} Writing profile/nodedef/nodedefs.xml".format(pfx))
-    if not os.path.exists("profile/nodedef"):
+    """
+        Render the node definitions and write them only when they differ from the profile
+        already on disk.  The file is replaced atomically.  Returns True when the profile
+        changed and needs to be pushed to the ISY.
+    """
+    nodedefs = render_profile(temperature_list, humidity_list, pressure_list,
+                              wind_list, rain_list, light_list, lightning_list)
+    digest = hashlib.sha256(nodedefs.encode('utf-8')).hexdigest()
+    if digest == profile_digest(NODEDEF_FILE):
+        LOGGER.info("{0} {1} unchanged".format(pfx, NODEDEF_FILE))
+        return False
+
+    LOGGER.info("{0} Writing {1}".format(pfx, NODEDEF_FILE))
+    directory = os.path.dirname(NODEDEF_FILE)
+    if not os.path.exists(directory):
         try:
-            os.makedirs("profile/nodedef")
+            os.makedirs(directory)
         except:
             LOGGER.error('unable to create node definition directory.')
 
-    nodedef = open("profile/nodedef/nodedefs.xml", "w")
-    nodedef.write("<nodeDefs>\n")
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.nodedefs')
+    try:
+        with os.fdopen(fd, 'w') as nodedef:
+            nodedef.write(nodedefs)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, NODEDEF_FILE)
+    except OSError:
+        os.unlink(tmp)
+        raise
+    _digests[NODEDEF_FILE] = digest
+
+    LOGGER.info(pfx + " done.")
+    return True
+
+
+def profile_digest(path):
+    # Hash of the profile last written, read from disk once per run
+    if path not in _digests:
+        try:
+            with open(path, 'rb') as f:
+                _digests[path] = hashlib.sha256(f.read()).hexdigest()
+        except OSError:
+            return None
+    return _digests[path]
+
+
+def render_profile(temperature_list, humidity_list, pressure_list,
+                   wind_list, rain_list, light_list, lightning_list):
+    out = []
+    out.append("<nodeDefs>\n")
 
     # First, write the controller node definition
-    nodedef.write(NODEDEF_TMPL % ('meteobridge', 'ctl'))
-    nodedef.write("    <sts>\n")
-    nodedef.write("      <st id=\"ST\" editor=\"bool\" />\n")
-    nodedef.write("      <st id=\"GV0\" editor=\"I_BATTERY\" />\n")
-    nodedef.write("      <st id=\"GV1\" editor=\"I_BATTERY\" />\n")
-    nodedef.write("      <st id=\"GV2\" editor=\"I_LAST_UPDATE\" />\n")
-    nodedef.write("      <st id=\"GV3\" editor=\"I_SECONDS\" />\n")
-    nodedef.write("    </sts>\n")
-    nodedef.write("    <cmds>\n")
-    nodedef.write("    <accepts>")
-    nodedef.write("     </accepts>")
-    nodedef.write("    </cmds>\n")
-    nodedef.write("  </nodeDef>\n\n")
+    out.append(NODEDEF_TMPL % ('meteobridge', 'ctl'))
+    out.append("    <sts>\n")
+    out.append("      <st id=\"ST\" editor=\"I_HUB_STATUS\" />\n")
+    out.append("      <st id=\"GV0\" editor=\"I_BATTERY\" />\n")
+    out.append("      <st id=\"GV1\" editor=\"I_BATTERY\" />\n")
+    out.append("      <st id=\"GV2\" editor=\"I_LAST_UPDATE\" />\n")
+    out.append("      <st id=\"GV3\" editor=\"I_SECONDS\" />\n")
+    out.append("      <st id=\"GV4\" editor=\"I_MSEC\" />\n")
+    out.append("      <st id=\"GV5\" editor=\"I_MSEC\" />\n")
+    out.append("      <st id=\"GV6\" editor=\"I_COUNT\" />\n")
+    out.append("    </sts>\n")
+    out.append("    <cmds>\n")
+    out.append("    <accepts>")
+    out.append("     </accepts>")
+    out.append("    </cmds>\n")
+    out.append("  </nodeDef>\n\n")
 
     # Need to translate temperature.main into <st id="ST" editor="TEMP_C" />
     # and     translate temperature.extra1 into <st id="GV5" editor="TEMP_C" />
 
     if len(temperature_list) > 0:
-        nodedef.write(NODEDEF_TMPL % ('temperature', 'TEMP'))
-        nodedef.write("    <sts>\n")
+        out.append(NODEDEF_TMPL % ('temperature', 'TEMP'))
+        out.append("    <sts>\n")
         for t in temperature_list:
-            nodedef.write(STATUS_TMPL % (uom.TEMP_DRVS[t], temperature_list[t]))
-        nodedef.write("    </sts>\n")
-        nodedef.write("  </nodeDef>\n")
+            out.append(STATUS_TMPL % (uom.TEMP_DRVS[t], temperature_list[t]))
+        out.append("    </sts>\n")
+        out.append("  </nodeDef>\n")
 
     if len(humidity_list) > 0:
-        nodedef.write(NODEDEF_TMPL % ('humidity', 'HUM'))
-        nodedef.write("    <sts>\n")
+        out.append(NODEDEF_TMPL % ('humidity', 'HUM'))
+        out.append("    <sts>\n")
         for t in humidity_list:
-            nodedef.write(STATUS_TMPL % (uom.HUMD_DRVS[t], humidity_list[t]))
-        nodedef.write("    </sts>\n")
-        nodedef.write("  </nodeDef>\n")
+            out.append(STATUS_TMPL % (uom.HUMD_DRVS[t], humidity_list[t]))
+        out.append("    </sts>\n")
+        out.append("  </nodeDef>\n")
 
     if len(pressure_list) > 0:
-        nodedef.write(NODEDEF_TMPL % ('pressure', 'PRESS'))
-        nodedef.write("    <sts>\n")
+        out.append(NODEDEF_TMPL % ('pressure', 'PRESS'))
+        out.append("    <sts>\n")
         for t in pressure_list:
-            nodedef.write(STATUS_TMPL % (uom.PRES_DRVS[t], pressure_list[t]))
-        nodedef.write("    </sts>\n")
-        nodedef.write("  </nodeDef>\n")
+            out.append(STATUS_TMPL % (uom.PRES_DRVS[t], pressure_list[t]))
+        out.append("    </sts>\n")
+        out.append("  </nodeDef>\n")
 
     if len(wind_list) > 0:
-        nodedef.write(NODEDEF_TMPL % ('wind', 'WIND'))
-        nodedef.write("    <editors   />\n")
-        nodedef.write("    <sts>\n")
+        out.append(NODEDEF_TMPL % ('wind', 'WIND'))
+        out.append("    <editors   />\n")
+        out.append("    <sts>\n")
         for t in wind_list:
-            nodedef.write(STATUS_TMPL % (uom.WIND_DRVS[t], wind_list[t]))
-        nodedef.write("    </sts>\n")
-        nodedef.write("  </nodeDef>\n")
+            out.append(STATUS_TMPL % (uom.WIND_DRVS[t], wind_list[t]))
+        out.append("    </sts>\n")
+        out.append("  </nodeDef>\n")
 
     if len(rain_list) > 0:
-        nodedef.write(NODEDEF_TMPL % ('precipitation', 'RAIN'))
-        nodedef.write("    <sts>\n")
+        out.append(NODEDEF_TMPL % ('precipitation', 'RAIN'))
+        out.append("    <sts>\n")
         for t in rain_list:
-            nodedef.write(STATUS_TMPL % (uom.RAIN_DRVS[t], rain_list[t]))
-        nodedef.write("    </sts>\n")
-        nodedef.write("  </nodeDef>\n")
+            out.append(STATUS_TMPL % (uom.RAIN_DRVS[t], rain_list[t]))
+        out.append("    </sts>\n")
+        out.append("  </nodeDef>\n")
 
     if len(light_list) > 0:
-        nodedef.write(NODEDEF_TMPL % ('light', 'LIGHT'))
-        nodedef.write("    <sts>\n")
+        out.append(NODEDEF_TMPL % ('light', 'LIGHT'))
+        out.append("    <sts>\n")
         for t in light_list:
-            nodedef.write(STATUS_TMPL % (uom.LITE_DRVS[t], light_list[t]))
-        nodedef.write("    </sts>\n")
-        nodedef.write("  </nodeDef>\n")
+            out.append(STATUS_TMPL % (uom.LITE_DRVS[t], light_list[t]))
+        out.append("    </sts>\n")
+        out.append("  </nodeDef>\n")
 
     if len(lightning_list) > 0:
-        nodedef.write(NODEDEF_TMPL % ('lightning', 'LIGHTNING'))
-        nodedef.write("    <sts>\n")
+        out.append(NODEDEF_TMPL % ('lightning', 'LIGHTNING'))
+        out.append("    <sts>\n")
         for t in lightning_list:
-            nodedef.write(STATUS_TMPL % (uom.LTNG_DRVS[t], lightning_list[t]))
-        nodedef.write("    </sts>\n")
-        nodedef.write("  </nodeDef>\n")
+            out.append(STATUS_TMPL % (uom.LTNG_DRVS[t], lightning_list[t]))
+        out.append("    </sts>\n")
+        out.append("  </nodeDef>\n")
 
-    nodedef.write("</nodeDefs>")
-
-    nodedef.close()
-
-    LOGGER.info(pfx + " done.")
+    out.append("</nodeDefs>")
 
+    return ''.join(out)